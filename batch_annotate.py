@@ -0,0 +1,134 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import multiprocessing
+
+from document import LayerRecord, LineRecord, TextRecord, FontSpec
+
+# 창 없이 그리기 위해 PyQt5를 불러오기 전에 정해야 함
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# 주 프로세스는 주석 문서를 읽고 나눠 주기만 하므로 PyQt5는 작업 프로세스에서만 불러옴
+app = None  # 작업 프로세스마다 하나 (글꼴/텍스트 배치에 필요)
+
+def init_worker():
+    global app
+    from PyQt5.QtGui import QGuiApplication
+    if QGuiApplication.instance() is None:
+        app = QGuiApplication(['batch_annotate'])
+
+def load_annotations(path):
+    # {"units": "pixels" | "relative", "opacity": 1.0, "lines": [...], "texts": [...]}
+    # -> (LayerRecord, relative 여부)
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    layer = LayerRecord.from_dict(data)
+    layer.opacity = data.get('opacity', 1.0)
+    return layer, data.get('units') == 'relative'
+
+def resolve_layer(layer, width, height, relative):
+    # 이미지 크기에 맞춘 픽셀 좌표 기록
+    # relative이면 좌표는 이미지 크기에 대한 비율, 글꼴 크기/선 두께는 짧은 변 1000픽셀 기준
+    sx, sy = (width, height) if relative else (1, 1)
+    scale = min(width, height) / 1000 if relative else 1.0
+    point = lambda value: (round(value[0] * sx), round(value[1] * sy))
+    lines = [LineRecord(point(line.start), point(line.mid), point(line.end), line.color, line.dashed, line.width * scale)
+             for line in layer.lines]
+    texts = [TextRecord(text.text, point(text.position),
+                        FontSpec(text.font.family, text.font.size * scale, text.font.weight, text.font.italic), text.color)
+             for text in layer.texts]
+    return LayerRecord(layer.name, layer.opacity, None, lines, texts)
+
+def output_path(path, out_dir, suffix, extension):
+    name, ext = os.path.splitext(os.path.basename(path))
+    return os.path.join(out_dir, f'{name}{suffix}{extension or ext}')
+
+def annotate_file(job):
+    # 작업 프로세스에서 실행: (경로, 결과 경로 또는 None, 단계별 시간 ms, 오류 메시지)
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QImage, QPainter
+    from image_loader import read_image
+    from test4 import Layer, paint_document
+    path, (annotations, relative), out_dir, suffix, extension, quality = job
+    timings = {}
+    start = time.perf_counter()
+    image = read_image(path)
+    timings['decode'] = (time.perf_counter() - start) * 1000
+    if image.isNull():
+        return path, None, timings, '이미지를 읽을 수 없습니다', 0
+    image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+
+    start = time.perf_counter()
+    base = Layer()
+    base.opacity = 1.0
+    annotation_layer = Layer.from_record(resolve_layer(annotations, image.width(), image.height(), relative))
+    layers = [(base, image), (annotation_layer, None)]
+    result = QImage(image.size(), QImage.Format_ARGB32_Premultiplied)
+    result.fill(Qt.transparent)
+    painter = QPainter(result)
+    paint_document(painter, layers, result.rect())
+    painter.end()
+    timings['render'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    target = output_path(path, out_dir, suffix, extension)
+    ok = result.save(target, quality=quality)
+    timings['encode'] = (time.perf_counter() - start) * 1000
+    pixels = image.width() * image.height()
+    if not ok:
+        return path, None, timings, '저장할 수 없습니다', pixels
+    return path, target, timings, None, pixels
+
+def expand_inputs(patterns):
+    # 셸이 와일드카드를 풀어 주지 않는 환경(Windows)을 위해 직접 풀어 줌
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        paths.extend(matches)
+    return list(dict.fromkeys(paths))
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='여러 이미지에 같은 치수 주석을 그려서 저장')
+    parser.add_argument('images', nargs='+', help='이미지 파일 또는 와일드카드 (예: photos/*.jpg)')
+    parser.add_argument('-a', '--annotations', required=True, help='주석 문서 (JSON)')
+    parser.add_argument('-o', '--out-dir', default='annotated', help='결과 폴더')
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count() or 1, help='작업 프로세스 수')
+    parser.add_argument('--suffix', default='_annotated', help='결과 파일 이름 뒤에 붙일 말')
+    parser.add_argument('--format', choices=['png', 'jpg', 'bmp'], help='결과 형식 (기본: 원본과 같음)')
+    parser.add_argument('--quality', type=int, default=90, help='JPEG 품질')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = expand_inputs(args.images)
+    if not paths:
+        print('처리할 이미지가 없습니다', file=sys.stderr)
+        return 1
+    annotations = load_annotations(args.annotations)
+    os.makedirs(args.out_dir, exist_ok=True)
+    extension = f'.{args.format}' if args.format else None
+    jobs = [(path, annotations, args.out_dir, args.suffix, extension, args.quality) for path in paths]
+
+    failures = 0
+    total_pixels = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(max(1, args.workers), initializer=init_worker) as pool:
+        for path, target, timings, error, pixels in pool.imap_unordered(annotate_file, jobs):
+            detail = ' '.join(f'{stage} {ms:.0f}ms' for stage, ms in timings.items())
+            if error:
+                failures += 1
+                print(f'실패 {path}: {error} ({detail})')
+            else:
+                total_pixels += pixels
+                print(f'{path} -> {target} ({detail})')
+    elapsed = time.perf_counter() - start
+    done = len(paths) - failures
+    print(f'{done}/{len(paths)}개 완료, {elapsed:.2f}초, {done / elapsed:.1f}장/초, '
+          f'{total_pixels / elapsed / 1e6:.1f}MP/초 (작업 프로세스 {args.workers}개)')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,166 @@
+# Qt 없이 쓰는 문서 모델: 작업 프로세스나 도구에서 PyQt5를 불러오지 않고 문서를 만들고 비교하고 저장함
+# 좌표는 원본 해상도 문서 좌표의 (x, y) 튜플, 색은 0xAARRGGBB 정수
+# 점/색/FontSpec은 값으로 다루므로 바꿀 때는 고치지 말고 새 값으로 바꿔 넣음
+from collections import Counter
+
+def parse_color(value):
+    # '#rrggbb', '#aarrggbb' 또는 정수
+    if isinstance(value, int):
+        return value
+    digits = value.lstrip('#')
+    if len(digits) == 6:
+        return 0xFF000000 | int(digits, 16)
+    if len(digits) == 8:
+        return int(digits, 16)
+    raise ValueError(f'색 형식이 잘못되었습니다: {value}')
+
+def format_color(rgba):
+    if rgba >> 24 == 0xFF:
+        return f'#{rgba & 0xFFFFFF:06x}'
+    return f'#{rgba:08x}'
+
+class Record:
+    # __slots__ 필드끼리 비교/복사하는 작은 기록 (인스턴스 사전이 없어 가볍고 pickle로 프로세스 사이에 넘길 수 있음)
+    __slots__ = ()
+    __hash__ = None
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+    def key(self):
+        # 필드 값 튜플 (비교/집계용)
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def copy(self):
+        return type(self)(*self.key())
+
+class FontSpec(Record):
+    __slots__ = ('family', 'size', 'weight', 'italic')  # size는 포인트, weight는 Qt 굵기 (50 보통, 75 굵게)
+
+    def __init__(self, family='굴림', size=12.0, weight=50, italic=False):
+        self.family = family
+        self.size = size
+        self.weight = weight
+        self.italic = italic
+
+    def __hash__(self):
+        return hash((self.family, self.size, self.weight, self.italic))
+
+    def to_dict(self):
+        return {'family': self.family, 'size': self.size, 'weight': self.weight, 'italic': self.italic}
+
+    @classmethod
+    def from_dict(cls, data):
+        weight = data.get('weight', 75 if data.get('bold') else 50)
+        return cls(data.get('family', '굴림'), data.get('size', 12.0), weight, data.get('italic', False))
+
+class LineRecord(Record):
+    __slots__ = ('start', 'mid', 'end', 'color', 'dashed', 'width')
+
+    def __init__(self, start, mid, end, color=0xFF0000FF, dashed=True, width=1.0):
+        self.start = start
+        self.mid = mid
+        self.end = end
+        self.color = color
+        self.dashed = dashed
+        self.width = width  # 문서 좌표 기준 선 두께
+
+    def bounds(self):
+        # (left, top, right, bottom), 선 두께는 넣지 않음
+        xs = (self.start[0], self.mid[0], self.end[0])
+        ys = (self.start[1], self.mid[1], self.end[1])
+        return (min(xs), min(ys), max(xs), max(ys))
+
+    def to_dict(self):
+        return {'start': list(self.start), 'mid': list(self.mid), 'end': list(self.end),
+                'color': format_color(self.color), 'dashed': self.dashed, 'width': self.width}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(tuple(data['start']), tuple(data['mid']), tuple(data['end']), parse_color(data.get('color', 0xFF0000FF)),
+                   data.get('dashed', True), data.get('width', 1.0))
+
+class TextRecord(Record):
+    __slots__ = ('text', 'position', 'font', 'color')
+
+    def __init__(self, text, position, font=None, color=0xFF0000FF):
+        self.text = text
+        self.position = position  # 글자 기준선 왼쪽이 아니라 글자 영역의 왼쪽 위
+        self.font = font or FontSpec()
+        self.color = color
+
+    def to_dict(self):
+        return {'text': self.text, 'position': list(self.position), 'font': self.font.to_dict(), 'color': format_color(self.color)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['text'], tuple(data['position']), FontSpec.from_dict(data.get('font', {})),
+                   parse_color(data.get('color', 0xFF0000FF)))
+
+class LayerRecord(Record):
+    __slots__ = ('name', 'opacity', 'source_path', 'lines', 'texts')
+
+    def __init__(self, name='', opacity=0.8, source_path=None, lines=None, texts=None):
+        self.name = name
+        self.opacity = opacity
+        self.source_path = source_path  # 래스터 원본 파일 (없으면 선/텍스트만 있는 레이어)
+        self.lines = lines if lines is not None else []
+        self.texts = texts if texts is not None else []
+
+    def copy(self):
+        return LayerRecord(self.name, self.opacity, self.source_path,
+                           [line.copy() for line in self.lines], [text.copy() for text in self.texts])
+
+    def to_dict(self):
+        return {'name': self.name, 'opacity': self.opacity, 'source_path': self.source_path,
+                'lines': [line.to_dict() for line in self.lines], 'texts': [text.to_dict() for text in self.texts]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('name', ''), data.get('opacity', 0.8), data.get('source_path'),
+                   [LineRecord.from_dict(line) for line in data.get('lines', [])],
+                   [TextRecord.from_dict(text) for text in data.get('texts', [])])
+
+class Document(Record):
+    __slots__ = ('width', 'height', 'layers')  # layers는 아래부터
+
+    def __init__(self, width, height, layers=None):
+        self.width = width
+        self.height = height
+        self.layers = layers if layers is not None else []
+
+    def copy(self):
+        return Document(self.width, self.height, [layer.copy() for layer in self.layers])
+
+    def to_dict(self):
+        return {'width': self.width, 'height': self.height, 'layers': [layer.to_dict() for layer in self.layers]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['width'], data['height'], [LayerRecord.from_dict(layer) for layer in data.get('layers', [])])
+
+def diff_items(old, new):
+    # 두 목록 사이에서 빠진 기록과 새로 생긴 기록 (같은 기록이 여러 번 있으면 개수까지 맞춤)
+    counts = Counter(record.key() for record in new)
+    removed = []
+    for record in old:
+        key = record.key()
+        if counts[key]:
+            counts[key] -= 1
+        else:
+            removed.append(record)
+    added = []
+    for record in reversed(new):
+        key = record.key()
+        if counts[key]:
+            counts[key] -= 1
+            added.append(record)
+    return removed, added[::-1]
+
+def diff_layers(old, new):
+    # (빠진 선, 생긴 선, 빠진 텍스트, 생긴 텍스트)
+    return diff_items(old.lines, new.lines) + diff_items(old.texts, new.texts)
\ No newline at end of file
@@ -0,0 +1,97 @@
+import numpy as np
+
+VERTEX_NAMES = ('start', 'mid', 'end')
+
+class SegmentArray:
+    # 한 레이어의 꺾은선(start-mid-end)을 연속된 NumPy 배열에 모아 한 번에 거리 계산
+    def __init__(self, capacity=64):
+        self.vertices = np.empty((capacity, 3, 2), dtype=np.float64)
+        self.items = []
+        self.rows = {}  # item -> 배열의 행 번호
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, item):
+        return item in self.rows
+
+    def set(self, item, vertices):
+        # vertices: ((x, y), (x, y), (x, y)) 순서는 start, mid, end
+        row = self.rows.get(item)
+        if row is None:
+            row = len(self.items)
+            if row == len(self.vertices):
+                grown = np.empty((row * 2, 3, 2), dtype=np.float64)
+                grown[:row] = self.vertices[:row]
+                self.vertices = grown
+            self.items.append(item)
+            self.rows[item] = row
+        self.vertices[row] = vertices
+
+    def remove(self, item):
+        # 마지막 행을 빈자리로 옮겨 배열을 연속으로 유지
+        row = self.rows.pop(item, None)
+        if row is None:
+            return
+        last = len(self.items) - 1
+        if row != last:
+            moved = self.items[last]
+            self.items[row] = moved
+            self.rows[moved] = row
+            self.vertices[row] = self.vertices[last]
+        self.items.pop()
+
+    def clear(self):
+        self.items = []
+        self.rows = {}
+
+    def select_rows(self, items=None):
+        if items is None:
+            return np.arange(len(self.items))
+        return np.fromiter((self.rows[item] for item in items if item in self.rows), dtype=np.intp)
+
+    def segment_distances(self, points, rows):
+        # points (m, 2) -> (m, k): 각 점에서 각 꺾은선까지의 최단 유클리드 거리
+        v = self.vertices[rows]
+        a = v[:, :2]          # (k, 2, 2) 두 선분의 시작점
+        ab = v[:, 1:] - a     # (k, 2, 2) 두 선분의 방향
+        ap = points[:, None, None, :] - a[None]
+        length2 = (ab * ab).sum(-1)
+        t = (ap * ab[None]).sum(-1) / np.where(length2 == 0, 1, length2)
+        t = np.clip(t, 0, 1)
+        diff = ap - t[..., None] * ab[None]
+        return np.sqrt((diff * diff).sum(-1)).min(-1)
+
+    def nearest_segments(self, points, threshold=np.inf, items=None):
+        # 여러 점을 한 번에: 점마다 threshold보다 가까운 꺾은선 (없으면 None)과 그 거리
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        rows = self.select_rows(items)
+        if not len(rows):
+            return [None] * len(points), np.full(len(points), np.inf)
+        distances = self.segment_distances(points, rows)
+        best = distances.argmin(1)
+        best_distances = distances[np.arange(len(points)), best]
+        found = [self.items[rows[b]] if d < threshold else None for b, d in zip(best, best_distances)]
+        return found, best_distances
+
+    def nearest_segment(self, x, y, threshold=np.inf, items=None):
+        found, distances = self.nearest_segments([(x, y)], threshold, items)
+        return found[0], distances[0]
+
+    def nearest_vertices(self, points, items=None):
+        # 점마다 가장 가까운 꼭짓점: [(item, 'start'|'mid'|'end'), ...]와 거리
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        rows = self.select_rows(items)
+        if not len(rows):
+            return [(None, None)] * len(points), np.full(len(points), np.inf)
+        v = self.vertices[rows].reshape(-1, 2)
+        diff = points[:, None, :] - v[None]
+        distances = np.sqrt((diff * diff).sum(-1))
+        best = distances.argmin(1)
+        found = [(self.items[rows[b // 3]], VERTEX_NAMES[b % 3]) for b in best]
+        return found, distances[np.arange(len(points)), best]
+
+    def nearest_vertex(self, x, y, items=None):
+        found, distances = self.nearest_vertices([(x, y)], items)
+        item, name = found[0]
+        return item, name, distances[0]
\ No newline at end of file
@@ -0,0 +1,86 @@
+# 실행 취소/다시 실행 스택
+# 명령은 문서 전체가 아니라 바뀐 값(이전/새 값, 지운 아이템)만 들고 있고, 전체 크기가 예산을 넘으면 오래된 것부터 버림
+
+CHANGE_BYTES = 128  # 필드 하나의 이전/새 값을 들고 있는 데 드는 대략의 메모리
+ITEM_BYTES = 1024  # 지운 아이템 하나(기록, 외곽 경로 캐시 포함)를 붙잡아 두는 데 드는 대략의 메모리
+
+class Command:
+    # redo()는 처음 실행할 때도 불림
+    def redo(self):
+        raise NotImplementedError
+
+    def undo(self):
+        raise NotImplementedError
+
+    def merge(self, other):
+        # 같은 끌기 동작의 다음 명령이면 합치고 True
+        return False
+
+    def size(self):
+        return CHANGE_BYTES
+
+    def discard(self, applied):
+        # 스택에서 영영 빠질 때 (applied: 실행된 상태로 빠지는지)
+        pass
+
+class UndoStack:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.commands = []  # [명령, 크기]
+        self.index = 0  # 이보다 앞은 실행된 명령, 뒤는 되돌린 명령
+        self.total = 0
+
+    def can_undo(self):
+        return self.index > 0
+
+    def can_redo(self):
+        return self.index < len(self.commands)
+
+    def push(self, command):
+        # 이미 실행한 명령을 쌓음 (되돌린 명령들은 버림)
+        for dropped, size in self.commands[self.index:]:
+            dropped.discard(applied=False)
+            self.total -= size
+        del self.commands[self.index:]
+        if self.commands and self.commands[-1][0].merge(command):
+            entry = self.commands[-1]
+            size = entry[0].size()
+            self.total += size - entry[1]
+            entry[1] = size
+        else:
+            size = command.size()
+            self.commands.append([command, size])
+            self.total += size
+            self.index += 1
+        self.evict()
+
+    def evict(self):
+        # 가장 최근 명령 하나는 예산을 넘어도 남김
+        while self.total > self.max_bytes and len(self.commands) > 1:
+            command, size = self.commands.pop(0)
+            command.discard(applied=True)
+            self.total -= size
+            self.index -= 1
+
+    def undo(self):
+        if not self.can_undo():
+            return None
+        self.index -= 1
+        command = self.commands[self.index][0]
+        command.undo()
+        return command
+
+    def redo(self):
+        if not self.can_redo():
+            return None
+        command = self.commands[self.index][0]
+        command.redo()
+        self.index += 1
+        return command
+
+    def clear(self):
+        for position, (command, _) in enumerate(self.commands):
+            command.discard(applied=position < self.index)
+        self.commands = []
+        self.index = 0
+        self.total = 0
\ No newline at end of file
@@ -0,0 +1,78 @@
+import os
+import threading
+from collections import OrderedDict
+from image_loader import read_image
+
+CACHE_BYTES = 256 * 1024 * 1024
+
+class ImageCache:
+    # 디코딩한 QImage를 (경로, 수정 시각, 목표 크기)로 찾는 LRU, 픽셀 바이트 합이 max_bytes를 넘으면 오래된 것부터 버림
+    # QImage는 암묵적으로 공유되므로 여러 곳에 돌려줘도 픽셀은 한 벌, 작업 스레드에서도 같이 씀
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.images = OrderedDict()  # 키 -> QImage
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(path, target_size=None):
+        # 파일이 바뀌면 키도 바뀌어 예전 이미지는 자연히 밀려남
+        return (os.path.abspath(path), os.stat(path).st_mtime_ns, tuple(target_size) if target_size else None)
+
+    def get(self, path, target_size=None):
+        try:
+            key = self.key(path, target_size)
+        except OSError:
+            return None
+        with self.lock:
+            image = self.images.get(key)
+            if image is None:
+                self.misses += 1
+                return None
+            self.images.move_to_end(key)
+            self.hits += 1
+            return image
+
+    def put(self, path, target_size, image):
+        if image.isNull():
+            return
+        try:
+            key = self.key(path, target_size)
+        except OSError:
+            return
+        size = image.sizeInBytes()
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            old = self.images.pop(key, None)
+            if old is not None:
+                self.total -= old.sizeInBytes()
+            self.images[key] = image
+            self.total += size
+            while self.total > self.max_bytes:
+                _, evicted = self.images.popitem(last=False)
+                self.total -= evicted.sizeInBytes()
+                self.evictions += 1
+
+    def load(self, path, target_size=None):
+        # 캐시에 없으면 read_image로 디코딩해서 넣음 (같은 파일을 두 스레드가 동시에 읽으면 둘 다 디코딩할 수 있음)
+        image = self.get(path, target_size)
+        if image is None:
+            image = read_image(path, target_size)
+            self.put(path, target_size, image)
+        return image
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'images': len(self.images), 'bytes': self.total}
+
+    def clear(self):
+        with self.lock:
+            self.images.clear()
+            self.total = 0
+
+image_cache = ImageCache()  # 탐색기와 편집기가 같이 쓰는 프로세스 전체 캐시
\ No newline at end of file
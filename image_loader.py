@@ -0,0 +1,125 @@
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QSize, pyqtSignal
+from PyQt5.QtGui import QImage, QImageReader
+
+def read_image(path, target_size=None):
+    # 헤더에서 원본 크기를 읽어 target_size에 맞춰 디코딩함 (JPEG는 DCT 단계에서 축소)
+    reader = QImageReader(path)
+    if target_size is None:
+        return reader.read()
+    target = QSize(*target_size)
+    size = reader.size()
+    if size.isValid():
+        reader.setScaledSize(size.scaled(target, Qt.KeepAspectRatio))
+        return reader.read()
+    # 헤더로 크기를 알 수 없는 형식은 다 읽은 뒤 줄임
+    image = reader.read()
+    if not image.isNull():
+        image = image.scaled(target, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image
+
+class LoadSignals(QObject):
+    # 작업 스레드에서 보내면 GUI 스레드에서 받도록 큐에 쌓임
+    finished = pyqtSignal(int, str, QImage)
+    failed = pyqtSignal(int, str, str)
+    cancelled = pyqtSignal(int)
+
+class LoadTask(QRunnable):
+    def __init__(self, job_id, path, target_size, signals, cache=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.job_id = job_id
+        self.path = path
+        self.target_size = target_size
+        self.signals = signals
+        self.cache = cache  # ImageCache, 있으면 디코딩한 이미지를 거기서 찾고 넣음
+        self.cancelled = False
+
+    def run(self):
+        # 취소됐더라도 끝났다는 신호는 항상 보내서 로더가 작업을 정리할 수 있게 함
+        if self.cancelled:
+            self.signals.cancelled.emit(self.job_id)
+            return
+        # QPixmap은 GUI 스레드에서만 쓸 수 있으므로 여기서는 QImage로 디코딩
+        if self.cache is not None:
+            image = self.cache.load(self.path, self.target_size)
+        else:
+            image = read_image(self.path, self.target_size)
+        if image.isNull():
+            self.signals.failed.emit(self.job_id, self.path, '이미지를 읽을 수 없습니다')
+            return
+        if self.cancelled:
+            self.signals.cancelled.emit(self.job_id)
+        else:
+            self.signals.finished.emit(self.job_id, self.path, image)
+
+class ImageLoader(QObject):
+    loaded = pyqtSignal(int, str, QImage)
+    failed = pyqtSignal(int, str, str)
+    progress = pyqtSignal(int, int)  # (끝난 작업 수, 전체 작업 수)
+
+    def __init__(self, parent=None, max_threads=None, cache=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.pool = QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(max_threads)
+        self.signals = LoadSignals()
+        self.signals.finished.connect(self.on_finished)
+        self.signals.failed.connect(self.on_failed)
+        self.signals.cancelled.connect(self.on_cancelled)
+        self.tasks = {}  # 작업 스레드가 끝났다고 알려 올 때까지 참조를 유지
+        self.next_id = 0
+        self.total = 0
+        self.done = 0
+
+    def load(self, path, target_size=None):
+        self.next_id += 1
+        task = LoadTask(self.next_id, path, target_size, self.signals, self.cache)
+        self.tasks[task.job_id] = task
+        self.total += 1
+        self.pool.start(task)
+        self.progress.emit(self.done, self.total)
+        return task.job_id
+
+    def cancel(self, job_id=None):
+        # job_id가 None이면 진행 중인 작업을 모두 취소
+        job_ids = list(self.tasks) if job_id is None else [job_id]
+        for key in job_ids:
+            task = self.tasks.get(key)
+            if task is None or task.cancelled:
+                continue
+            task.cancelled = True
+            self.done += 1
+            if self.pool.tryTake(task):
+                # 아직 시작하지 않은 작업은 바로 정리
+                del self.tasks[key]
+        self.report_progress()
+
+    def is_busy(self):
+        return any(not task.cancelled for task in self.tasks.values())
+
+    def take(self, job_id):
+        # 취소된 작업이면 None (진행 수는 취소할 때 이미 셌음)
+        task = self.tasks.pop(job_id, None)
+        if task is None or task.cancelled:
+            return None
+        self.done += 1
+        return task
+
+    def on_finished(self, job_id, path, image):
+        if self.take(job_id):
+            self.loaded.emit(job_id, path, image)
+            self.report_progress()
+
+    def on_failed(self, job_id, path, message):
+        if self.take(job_id):
+            self.failed.emit(job_id, path, message)
+            self.report_progress()
+
+    def on_cancelled(self, job_id):
+        self.tasks.pop(job_id, None)
+
+    def report_progress(self):
+        self.progress.emit(self.done, self.total)
+        if not self.is_busy():
+            self.total = self.done = 0
\ No newline at end of file
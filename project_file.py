@@ -0,0 +1,104 @@
+import json
+import mmap
+import struct
+from document import Document
+
+# 편집 가능한 프로젝트 파일
+# [머리 32바이트][래스터 조각 ...][색인 JSON]
+# 머리: 식별자, 판, 예약, 색인 위치, 색인 길이
+# 래스터 조각은 ARGB32(premultiplied) 픽셀을 줄 사이 여백 없이 그대로 두고 페이지 경계에 맞춰 둠
+# -> 파일 전체를 메모리 맵으로 열고 색인만 읽으면 되며, 픽셀은 그 레이어를 처음 그릴 때 필요한 페이지만 읽힘
+MAGIC = b'IMGPROJ\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQ')
+ALIGN = 4096
+PIXEL_FORMAT = 'argb32_premultiplied'
+
+class RasterChunk:
+    __slots__ = ('project', 'offset', 'width', 'height', 'scale')
+
+    def __init__(self, project, offset, width, height, scale):
+        self.project = project
+        self.offset = offset
+        self.width = width
+        self.height = height
+        self.scale = scale  # 문서 대비 배율 (편집기의 대리 이미지 배율)
+
+    def nbytes(self):
+        return self.width * self.height * 4
+
+    def data(self):
+        # 복사 없이 메모리 맵을 가리키는 memoryview (프로젝트가 열려 있는 동안만 유효)
+        return memoryview(self.project.map)[self.offset:self.offset + self.nbytes()]
+
+class ProjectFile:
+    # 열 때는 머리와 색인만 읽음, 형식이 잘못되면 ValueError
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, index_offset, index_size = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC:
+                raise ValueError(f'프로젝트 파일이 아닙니다: {path}')
+            if version > VERSION:
+                raise ValueError(f'지원하지 않는 프로젝트 판입니다: {version}')
+            if index_offset < HEADER.size or index_offset + index_size > len(self.map):
+                raise ValueError(f'색인이 잘못되었습니다: {path}')
+            index = json.loads(self.map[index_offset:index_offset + index_size].decode('utf-8'))
+            self.document = Document.from_dict(index['document'])
+            self.rasters = [None if entry is None else self.chunk(entry, index_offset) for entry in index['rasters']]
+            if len(self.rasters) != len(self.document.layers):
+                raise ValueError(f'색인이 잘못되었습니다: {path}')
+        except (ValueError, KeyError, TypeError, struct.error):
+            self.close()
+            raise ValueError(f'프로젝트 파일을 읽을 수 없습니다: {path}')
+
+    def chunk(self, entry, end):
+        # 조각이 머리와 색인 사이에 다 들어 있는지 확인함 (잘리거나 망가진 파일이면 픽셀을 버퍼 밖에서 읽게 됨)
+        offset, width, height = entry['offset'], entry['width'], entry['height']
+        if entry.get('format') != PIXEL_FORMAT:
+            raise ValueError(f'지원하지 않는 픽셀 형식입니다: {entry.get("format")}')
+        if not all(isinstance(value, int) for value in (offset, width, height)) or width <= 0 or height <= 0 \
+                or offset < HEADER.size or offset + width * height * 4 > end:
+            raise ValueError(f'래스터 조각이 파일 범위를 벗어납니다: {self.path}')
+        return RasterChunk(self, offset, width, height, entry['scale'])
+
+    def reopen(self):
+        # close() 뒤 같은 파일을 다시 맵으로 엶 (색인과 RasterChunk는 그대로 씀)
+        self.file = open(self.path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        # 아직 쓰고 있는 memoryview가 있으면 맵은 가비지 컬렉션에 맡김
+        if getattr(self, 'map', None) is not None:
+            try:
+                self.map.close()
+            except BufferError:
+                pass
+            self.map = None
+        self.file.close()
+
+def write_project(path, document, rasters):
+    # rasters: 레이어 순서(아래부터)대로 None 또는 (너비, 높이, 배율, 픽셀 버퍼)를 내는 반복자
+    # 레이어 하나씩 받아 바로 쓰므로 모든 레이어 픽셀을 한꺼번에 메모리에 올리지 않음
+    entries = []
+    with open(path, 'wb') as f:
+        f.write(bytes(HEADER.size))
+        for raster in rasters:
+            if raster is None:
+                entries.append(None)
+                continue
+            width, height, scale, data = raster
+            offset = -(-f.tell() // ALIGN) * ALIGN
+            f.write(bytes(offset - f.tell()))
+            f.write(data)
+            entries.append({'offset': offset, 'width': width, 'height': height, 'scale': scale, 'format': PIXEL_FORMAT})
+        if len(entries) != len(document.layers):
+            raise ValueError('레이어 수와 래스터 수가 다릅니다')
+        index = json.dumps({'document': document.to_dict(), 'rasters': entries}, ensure_ascii=False,
+                           separators=(',', ':')).encode('utf-8')
+        index_offset = f.tell()
+        f.write(index)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, 0, index_offset, len(index)))
\ No newline at end of file
@@ -0,0 +1,124 @@
+import math
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QRectF, QSize, pyqtSignal
+from PyQt5.QtGui import QPainter
+from tile_store import TiledImage, TILE_SIZE
+
+class LevelSignals(QObject):
+    finished = pyqtSignal(int, object)  # (단계, TiledImage 또는 None)
+
+def build_level(source_path, size, cache_dir, parent=None):
+    # 단계 0은 원본에서 (가능하면 띠 단위로) 읽고, 그 아래 단계는 바로 위 단계의 타일을 반으로 줄여 만듦
+    # -> 원본 전체를 단계마다 다시 디코딩하지 않으므로 메모리가 타일 몇 줄로 제한됨
+    try:
+        if parent is None:
+            return TiledImage.from_file(source_path, (size.width(), size.height()), cache_dir)
+        return parent.half(source_path, cache_dir)
+    except OSError:
+        return None
+
+class LevelTask(QRunnable):
+    def __init__(self, level, source_path, size, cache_dir, signals, parent=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.level = level
+        self.source_path = source_path
+        self.size = size
+        self.cache_dir = cache_dir
+        self.signals = signals
+        self.parent = parent  # 위 단계 TiledImage (단계 0이면 None)
+
+    def run(self):
+        self.signals.finished.emit(self.level, build_level(self.source_path, self.size, self.cache_dir, self.parent))
+
+class ImagePyramid(QObject):
+    # 단계 k는 원본의 1/2^k 크기 타일 이미지, 필요해진 단계만 작업 스레드에서 만들어 둠
+    level_ready = pyqtSignal(int)
+
+    def __init__(self, source_path, size, cache_dir=None, pool=None, parent=None):
+        super().__init__(parent)
+        self.source_path = source_path
+        self.size = QSize(size)  # 단계 0 (문서 해상도) 크기
+        self.cache_dir = cache_dir
+        self.pool = pool or QThreadPool.globalInstance()
+        self.levels = {}  # 단계 -> TiledImage
+        self.tasks = {}  # 만드는 중인 단계 -> LevelTask
+        self.waiting = set()  # 위 단계가 만들어지기를 기다리는 단계
+        self.failed = set()
+        self.signals = LevelSignals()
+        self.signals.finished.connect(self.on_finished)
+        longest = max(size.width(), size.height(), 1)
+        self.level_count = max(1, math.ceil(math.log2(longest / TILE_SIZE)) + 1) if longest > TILE_SIZE else 1
+
+    def level_size(self, level):
+        factor = 2 ** level
+        return QSize(max(1, -(-self.size.width() // factor)), max(1, -(-self.size.height() // factor)))
+
+    def level_for(self, scale):
+        # 배율 scale로 그릴 때 해상도가 모자라지 않는 가장 작은 단계
+        if scale >= 1:
+            return 0
+        return min(self.level_count - 1, int(math.floor(math.log2(1 / scale))))
+
+    def level(self, level, wait=False):
+        # 만들어 둔 단계를 돌려줌, 없으면 작업을 걸고 None (wait이면 이 스레드에서 바로 만듦)
+        tiles = self.levels.get(level)
+        if tiles is not None or level in self.failed:
+            return tiles
+        parent = None
+        if level > 0:
+            parent = self.level(level - 1, wait)
+            if parent is None:
+                if level - 1 in self.failed:
+                    self.failed.add(level)
+                else:
+                    self.waiting.add(level)
+                return None
+        if wait:
+            tiles = build_level(self.source_path, self.level_size(level), self.cache_dir, parent)
+            self.store(level, tiles)
+            return tiles
+        if level not in self.tasks:
+            task = LevelTask(level, self.source_path, self.level_size(level), self.cache_dir, self.signals, parent)
+            self.tasks[level] = task
+            self.pool.start(task)
+        return None
+
+    def nearest_ready(self, level):
+        # 원하는 단계가 아직 없으면 이미 있는 단계 중 가까운 것 (같은 거리면 해상도가 높은 쪽)
+        ready = sorted(self.levels, key=lambda k: (abs(k - level), k))
+        return ready[0] if ready else None
+
+    def store(self, level, tiles):
+        if tiles is None:
+            self.failed.add(level)
+        else:
+            self.levels[level] = tiles
+
+    def on_finished(self, level, tiles):
+        self.tasks.pop(level, None)
+        self.store(level, tiles)
+        if tiles is not None:
+            self.level_ready.emit(level)
+        if level + 1 in self.waiting:
+            self.waiting.discard(level + 1)
+            self.level(level + 1)
+
+    def draw(self, painter, clip, scale, offset):
+        # clip은 화면 좌표, 화면 = 문서 * scale + offset. 그릴 단계가 하나도 없으면 False
+        wanted = self.level_for(scale)
+        self.level(wanted)
+        level = wanted if wanted in self.levels else self.nearest_ready(wanted)
+        if level is None:
+            return False
+        tiles = self.levels[level]
+        factor = scale * self.size.width() / tiles.size.width()  # 단계 픽셀 -> 화면 픽셀
+        level_clip = QRectF(clip.translated(-offset))
+        level_clip = QRectF(level_clip.x() / factor, level_clip.y() / factor,
+                            level_clip.width() / factor, level_clip.height() / factor)
+        painter.save()
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.translate(offset)
+        painter.scale(factor, factor)
+        tiles.draw(painter, level_clip.toAlignedRect().adjusted(-1, -1, 1, 1))
+        painter.restore()
+        return True
\ No newline at end of file
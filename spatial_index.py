@@ -0,0 +1,80 @@
+from collections import defaultdict
+
+class SpatialGrid:
+    # 아이템의 경계 사각형을 균일 격자에 넣어 두고 점/사각형으로 찾는 색인
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = defaultdict(set)
+        self.bounds = {}  # item -> (left, top, right, bottom)
+
+    def __len__(self):
+        return len(self.bounds)
+
+    def __contains__(self, item):
+        return item in self.bounds
+
+    def cell_range(self, left, top, right, bottom):
+        size = self.cell_size
+        for cx in range(int(left // size), int(right // size) + 1):
+            for cy in range(int(top // size), int(bottom // size) + 1):
+                yield (cx, cy)
+
+    def insert(self, item, bounds):
+        if item in self.bounds:
+            self.remove(item)
+        self.bounds[item] = bounds
+        for cell in self.cell_range(*bounds):
+            self.cells[cell].add(item)
+
+    def remove(self, item):
+        bounds = self.bounds.pop(item, None)
+        if bounds is None:
+            return
+        for cell in self.cell_range(*bounds):
+            items = self.cells.get(cell)
+            if items is not None:
+                items.discard(item)
+                if not items:
+                    del self.cells[cell]
+
+    def update(self, item, bounds):
+        # 같은 칸에 머무르면 칸 목록은 건드리지 않음
+        old = self.bounds.get(item)
+        if old is not None and list(self.cell_range(*old)) == list(self.cell_range(*bounds)):
+            self.bounds[item] = bounds
+            return
+        self.insert(item, bounds)
+
+    def clear(self):
+        self.cells.clear()
+        self.bounds.clear()
+
+    def set_cell_size(self, cell_size):
+        # 칸 크기를 바꾸고 들어 있는 아이템을 다시 넣음
+        if cell_size == self.cell_size:
+            return
+        self.cell_size = cell_size
+        self.cells.clear()
+        for item, bounds in self.bounds.items():
+            for cell in self.cell_range(*bounds):
+                self.cells[cell].add(item)
+
+    def query_point(self, x, y):
+        size = self.cell_size
+        result = []
+        for item in self.cells.get((int(x // size), int(y // size)), ()):
+            left, top, right, bottom = self.bounds[item]
+            if left <= x <= right and top <= y <= bottom:
+                result.append(item)
+        return result
+
+    def query_rect(self, left, top, right, bottom):
+        found = set()
+        for cell in self.cell_range(left, top, right, bottom):
+            found.update(self.cells.get(cell, ()))
+        result = []
+        for item in found:
+            l, t, r, b = self.bounds[item]
+            if l <= right and left <= r and t <= bottom and top <= b:
+                result.append(item)
+        return result
\ No newline at end of file
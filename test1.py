@@ -1,20 +1,102 @@
 import sys
 import re
-from PyQt5.QtWidgets import QApplication, QMainWindow, QTreeView, QFileSystemModel, QVBoxLayout, QWidget, QLabel, QSplitter
-from PyQt5.QtCore import QSortFilterProxyModel, QRegExp, Qt, pyqtSignal
-from PyQt5.QtGui import QPixmap
+from collections import OrderedDict
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QTreeView, QFileSystemModel, QVBoxLayout, QWidget, QLabel, QSplitter,
+                             QPushButton, QStackedWidget)
+from PyQt5.QtCore import QSortFilterProxyModel, Qt, QSize, QObject, pyqtSignal
+from PyQt5.QtGui import QPixmap, QIcon
+from image_loader import ImageLoader
+from image_cache import image_cache
+from thumbnails import ThumbnailLoader, ThumbnailGridView
 
 class ImageFileFilterProxyModel(QSortFilterProxyModel):
+    def __init__(self, thumbnailLoader=None, parent=None):
+        super().__init__(parent)
+        # 이미지 파일 아이콘 자리에 썸네일을 보여 줌 (보이는 줄만 data()가 불리므로 보이는 것만 만들어짐)
+        self.thumbnailLoader = thumbnailLoader
+        if thumbnailLoader is not None:
+            thumbnailLoader.ready.connect(self.onThumbnailReady)
+
     def filterAcceptsRow(self, source_row, source_parent):
         index = self.sourceModel().index(source_row, 0, source_parent)
         if self.sourceModel().isDir(index):
             return True
         file_name = self.sourceModel().fileName(index)
-        return bool(QRegExp.match(r".*\.(jpg|jpeg|png)$", file_name, QRegExp.IGNORECASE))
+        return bool(re.match(r".*\.(jpg|jpeg|png)$", file_name, re.IGNORECASE))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DecorationRole and self.thumbnailLoader is not None and index.column() == 0:
+            source_index = self.mapToSource(index)
+            if not self.sourceModel().isDir(source_index):
+                pixmap = self.thumbnailLoader.pixmap(self.sourceModel().filePath(source_index))
+                if pixmap is not None:
+                    return QIcon(pixmap)
+        return super().data(index, role)
+
+    def onThumbnailReady(self, file_path):
+        index = self.mapFromSource(self.sourceModel().index(file_path))
+        if index.isValid():
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+class PreviewPrefetcher(QObject):
+    # 미리보기 크기로 디코딩한 이미지를 LRU로 두고, 보고 있는 이미지의 앞뒤 이미지를 작업 스레드에서 미리 읽음
+    loaded = pyqtSignal(str)
+
+    def __init__(self, parent=None, maxImages=16):
+        super().__init__(parent)
+        self.loader = ImageLoader(self, max_threads=2, cache=image_cache)
+        self.loader.loaded.connect(self.onLoaded)
+        self.loader.failed.connect(self.onFailed)
+        self.images = OrderedDict()  # (경로, 크기) -> QImage
+        self.maxImages = maxImages
+        self.pending = {}  # (경로, 크기) -> 작업 번호
+        self.jobs = {}  # 작업 번호 -> (경로, 크기)
+
+    def image(self, path, size):
+        key = (path, size)
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+        return image
+
+    def isPending(self, path, size):
+        return (path, size) in self.pending
+
+    def put(self, path, size, image):
+        self.images[(path, size)] = image
+        if len(self.images) > self.maxImages:
+            self.images.popitem(last=False)
+
+    def prefetch(self, paths, size):
+        # paths 순서대로 읽음, 목록에서 빠진 읽기 요청은 취소함
+        keys = [(path, size) for path in paths]
+        for key in [key for key in self.pending if key not in keys]:
+            jobId = self.pending.pop(key)
+            del self.jobs[jobId]
+            self.loader.cancel(jobId)
+        for key in keys:
+            if key not in self.images and key not in self.pending:
+                jobId = self.loader.load(*key)
+                self.pending[key] = jobId
+                self.jobs[jobId] = key
+
+    def onLoaded(self, jobId, path, image):
+        key = self.jobs.pop(jobId, None)
+        if key is None:
+            return
+        del self.pending[key]
+        self.put(path, key[1], image)
+        self.loaded.emit(path)
+
+    def onFailed(self, jobId, path, message):
+        key = self.jobs.pop(jobId, None)
+        if key is not None:
+            del self.pending[key]
 
 class FileExplorerWidget(QWidget):
     # Define a custom signal that emits the file path as a string
     fileDoubleClicked = pyqtSignal(str)
+    fileSelected = pyqtSignal(str)  # 방향키 등으로 현재 파일이 바뀜
 
     def __init__(self):
         super().__init__()
@@ -29,12 +111,15 @@ class FileExplorerWidget(QWidget):
         self.model = QFileSystemModel()
         self.model.setRootPath('')
 
-        self.proxyModel = ImageFileFilterProxyModel()
+        self.thumbnailLoader = ThumbnailLoader(self)
+        self.proxyModel = ImageFileFilterProxyModel(self.thumbnailLoader)
         self.proxyModel.setSourceModel(self.model)
         self.proxyModel.setFilterKeyColumn(0)  # Apply filter on the file names
 
         self.tree = QTreeView()
         self.tree.setModel(self.proxyModel)
+        self.tree.setIconSize(QSize(48, 48))
+        self.tree.setUniformRowHeights(True)  # 줄 높이를 줄마다 재지 않음 (수천 개 폴더에서 스크롤이 가벼움)
         self.tree.setRootIndex(self.proxyModel.mapFromSource(self.model.index('')))
         self.tree.setColumnWidth(0, 400)
 
@@ -44,11 +129,35 @@ class FileExplorerWidget(QWidget):
 
         self.tree.doubleClicked.connect(self.onDoubleClick)
 
+        # 목록 보기와 썸네일 격자 보기를 버튼으로 바꿈
+        self.grid = ThumbnailGridView(self.thumbnailLoader)
+        self.grid.setModel(self.proxyModel)
+        self.grid.doubleClicked.connect(self.onGridDoubleClick)
+        self.grid.folder_activated.connect(self.grid.setRootIndex)
+
+        self.views = QStackedWidget()
+        self.views.addWidget(self.tree)
+        self.views.addWidget(self.grid)
+
+        self.viewToggle = QPushButton('격자 보기')
+        self.viewToggle.setCheckable(True)
+        self.viewToggle.toggled.connect(self.setGridMode)
+
+        # 목록/격자에서 방향키로 옮겨 다니면 그 파일을 미리 봄
+        self.tree.selectionModel().currentChanged.connect(self.onCurrentChanged)
+        self.grid.selectionModel().currentChanged.connect(self.onCurrentChanged)
+
+        browser = QWidget()
+        browserLayout = QVBoxLayout(browser)
+        browserLayout.setContentsMargins(0, 0, 0, 0)
+        browserLayout.addWidget(self.viewToggle)
+        browserLayout.addWidget(self.views)
+
         self.imageLabel = QLabel()
         self.imageLabel.setAlignment(Qt.AlignCenter)
         self.imageLabel.setMinimumSize(1, 1)
 
-        self.splitter.addWidget(self.tree)
+        self.splitter.addWidget(browser)
         self.splitter.addWidget(self.imageLabel)
 
     def onDoubleClick(self, index):
@@ -57,9 +166,49 @@ class FileExplorerWidget(QWidget):
         file_path = self.model.filePath(source_index)
         self.fileDoubleClicked.emit(file_path)
 
+    def onCurrentChanged(self, current, previous):
+        source_index = self.proxyModel.mapToSource(current)
+        if current.isValid() and not self.model.isDir(source_index):
+            self.fileSelected.emit(self.model.filePath(source_index))
+
+    def neighbourPaths(self, file_path, count):
+        # 같은 폴더에서 목록 순서로 앞뒤 count개의 파일 (가까운 것부터, 같은 거리면 다음 것 먼저)
+        index = self.proxyModel.mapFromSource(self.model.index(file_path))
+        if not index.isValid():
+            return []
+        parent = index.parent()
+        rows = self.proxyModel.rowCount(parent)
+        paths = []
+        for distance in range(1, count + 1):
+            for row in (index.row() + distance, index.row() - distance):
+                if 0 <= row < rows:
+                    source_index = self.proxyModel.mapToSource(self.proxyModel.index(row, 0, parent))
+                    if not self.model.isDir(source_index):
+                        paths.append(self.model.filePath(source_index))
+        return paths
+
+    def setGridMode(self, enabled):
+        if enabled:
+            # 목록에서 고른 폴더(파일이면 그 파일의 폴더)를 격자로 보여 줌
+            index = self.tree.currentIndex()
+            if index.isValid() and not self.model.isDir(self.proxyModel.mapToSource(index)):
+                index = index.parent()
+            self.grid.setRootIndex(index if index.isValid() else self.tree.rootIndex())
+        self.views.setCurrentWidget(self.grid if enabled else self.tree)
+
+    def onGridDoubleClick(self, index):
+        # 폴더는 격자 안에서 열고, 파일은 목록에서 더블클릭한 것과 같이 처리
+        if self.model.isDir(self.proxyModel.mapToSource(index)):
+            self.grid.setRootIndex(index)
+        else:
+            self.onDoubleClick(index)
+
 class MainWindow(QMainWindow):
+    PREFETCH_COUNT = 3  # 앞뒤로 미리 읽어 둘 이미지 수
+
     def __init__(self):
         super().__init__()
+        self.currentPath = None
         self.initUI()
 
     def initUI(self):
@@ -71,11 +220,30 @@ class MainWindow(QMainWindow):
 
         # Connect the custom signal to a slot in the main window
         self.fileExplorerWidget.fileDoubleClicked.connect(self.showImage)
+        self.fileExplorerWidget.fileSelected.connect(self.showImage)
+
+        self.previews = PreviewPrefetcher(self, maxImages=4 * self.PREFETCH_COUNT + 1)
+        self.previews.loaded.connect(self.onPreviewLoaded)
 
     def showImage(self, file_path):
-        pixmap = QPixmap(file_path)
-        self.fileExplorerWidget.imageLabel.setPixmap(pixmap.scaled(
-            self.fileExplorerWidget.imageLabel.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        # 미리보기 크기로 줄여서 디코딩, 미리 읽어 둔 것이 있으면 그것을 씀
+        label_size = self.fileExplorerWidget.imageLabel.size()
+        size = (label_size.width(), label_size.height())
+        self.currentPath = file_path
+        image = self.previews.image(file_path, size)
+        if image is None and not self.previews.isPending(file_path, size):
+            image = image_cache.load(file_path, size)
+            if not image.isNull():
+                self.previews.put(file_path, size, image)
+        if image is not None:
+            self.fileExplorerWidget.imageLabel.setPixmap(QPixmap.fromImage(image))
+        # 읽는 중인 지금 이미지도 목록에 넣어 취소되지 않게 함
+        neighbours = self.fileExplorerWidget.neighbourPaths(file_path, self.PREFETCH_COUNT)
+        self.previews.prefetch([file_path] + neighbours, size)
+
+    def onPreviewLoaded(self, file_path):
+        if file_path == self.currentPath:
+            self.showImage(file_path)
 
 def main():
     app = QApplication(sys.argv)
@@ -1,34 +1,473 @@
 import sys
+import os
 import re
+import json
+import time
+import hashlib
+import math
+import itertools
+from collections import OrderedDict
+from operator import attrgetter
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QLabel, QAction, QFileDialog, QTreeView, QFileSystemModel, QSplitter,
                              QVBoxLayout, QHBoxLayout, QWidget, QPushButton, QListWidget, QListWidgetItem,
-                             QColorDialog, QInputDialog, QComboBox,QMenu, QToolBar)
-from PyQt5.QtGui import QPixmap, QPainter, QPen, QColor, QFont, QMouseEvent, QCursor, QIcon, QFontDatabase, QKeyEvent
-from PyQt5.QtCore import Qt, QSize, QRectF, QSizeF, pyqtSignal, QPointF, QSortFilterProxyModel, QRegExp
+                             QColorDialog, QInputDialog, QComboBox,QMenu, QToolBar, QProgressBar, QStackedWidget)
+from PyQt5.QtGui import (QPixmap, QPainter, QPen, QColor, QFont, QMouseEvent, QCursor, QIcon, QFontDatabase, QKeyEvent, QRegion,
+                         QStaticText, QTransform, QFontMetricsF, QImage, QImageReader, QPainterPath, QPainterPathStroker,
+                         QKeySequence)
+from PyQt5.QtCore import (Qt, QSize, QRect, QRectF, pyqtSignal, QPoint, QPointF, QSortFilterProxyModel, QTimer,
+                          QStandardPaths, QRunnable, QThreadPool)
+from spatial_index import SpatialGrid
+from geometry import SegmentArray
+from image_loader import ImageLoader
+from image_cache import image_cache
+from pyramid import ImagePyramid
+from document import Document, LayerRecord, LineRecord, TextRecord, FontSpec
+from project_file import ProjectFile, write_project
+from history import Command, UndoStack, CHANGE_BYTES, ITEM_BYTES
+from thumbnails import ThumbnailLoader, ThumbnailGridView
+
+DAMAGE_MARGIN = 8  # 선택 선 두께(3)와 꼭짓점 핸들 반지름(5)을 덮는 여유
+
+def rect_bounds(rect):
+    return (rect.left(), rect.top(), rect.right(), rect.bottom())
+
+item_order = itertools.count()  # 아이템을 만든 순서, 레이어 목록 순서와 같으므로 목록을 훑지 않고 정렬함
+
+def line_vertices(line):
+    record = line.record
+    return (record.start, record.mid, record.end)
+
+def point_tuple(point):
+    return (point.x(), point.y())
+
+def font_spec(font):
+    return FontSpec(font.family(), font.pointSizeF(), font.weight(), font.italic())
+
+qt_fonts = {}  # FontSpec -> QFont
+
+def qt_font(spec):
+    font = qt_fonts.get(spec)
+    if font is None:
+        font = QFont(spec.family)
+        font.setPointSizeF(spec.size)
+        font.setWeight(spec.weight)
+        font.setItalic(spec.italic)
+        qt_fonts[spec] = font
+    return font
+
+def point_property(name):
+    # 기록의 (x, y) 튜플을 QPoint로 읽고 씀
+    return property(lambda self: QPoint(*getattr(self.record, name)),
+                    lambda self, point: setattr(self.record, name, point_tuple(point)))
+
+def color_property():
+    return property(lambda self: QColor.fromRgba(self.record.color),
+                    lambda self, color: setattr(self.record, 'color', QColor(color).rgba()))
+
+def make_buffer(size, ratio=1.0):
+    # 장치 픽셀 배율(HiDPI)만큼 큰 픽스맵, 그릴 때는 논리 좌표를 그대로 씀
+    pixmap = QPixmap(size * ratio)
+    pixmap.setDevicePixelRatio(ratio)
+    pixmap.fill(Qt.transparent)  # 알파 채널이 있는 픽스맵으로 만들기 위해 먼저 채움
+    return pixmap
+
+def blit(painter, rect, pixmap):
+    # rect(논리 좌표) 영역만 같은 자리로 복사 (drawPixmap의 원본 사각형은 장치 픽셀 단위)
+    ratio = pixmap.devicePixelRatioF()
+    source = QRectF(rect.x() * ratio, rect.y() * ratio, rect.width() * ratio, rect.height() * ratio)
+    painter.drawPixmap(QRectF(rect), pixmap, source)
+
+def scroll_buffer(pixmap, dx, dy):
+    ratio = pixmap.devicePixelRatioF()
+    pixmap.scroll(round(dx * ratio), round(dy * ratio), pixmap.rect())
+
+class TextLayoutCache:
+    # (텍스트, 글꼴, 색, 배율) 별로 글자 배치(QStaticText)와 영역을 재사용
+    def __init__(self, max_entries=4096):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+
+    def key(self, text, font, color, scale=1.0):
+        return (text, font.key(), QColor(color).rgba(), round(scale, 6))
+
+    def layout(self, text, font, color, scale=1.0):
+        # scale: 그릴 때 painter에 걸리는 배율 (영역은 배율과 상관없이 문서 좌표)
+        key = self.key(text, font, color, scale)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry
+        static_text = QStaticText(text)
+        static_text.setTextFormat(Qt.PlainText)
+        static_text.prepare(QTransform.fromScale(scale, scale), font)
+        rect = QFontMetricsF(font).boundingRect(QRectF(), Qt.AlignLeft, text)
+        entry = (static_text, rect)
+        self.entries[key] = entry
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    def discard(self, text, font, color):
+        # 모든 배율의 항목을 버림
+        prefix = self.key(text, font, color)[:3]
+        for key in [key for key in self.entries if key[:3] == prefix]:
+            del self.entries[key]
+
+text_layouts = TextLayoutCache()
 
 class Layer:
-    def __init__(self, pixmap=None):
-        self.pixmap = pixmap
+    def __init__(self, pixmap=None, source_path=None, pixmap_scale=1.0, raster=None, cell_size=64):
+        self._pixmap = pixmap  # 맞춤 배율(pixmap_scale)로 줄인 대리 이미지
+        self.raster = raster  # 프로젝트 파일에서 연 레이어의 픽셀 조각 (RasterChunk), 처음 그릴 때 pixmap으로 꺼냄
+        self.pixmap_scale = pixmap_scale
+        self.source_path = source_path  # 내보낼 때 원본 해상도로 다시 읽을 파일
+        self.pyramid = None  # 확대해서 볼 때 쓰는 원본의 단계별 축소 타일 (ImagePyramid)
         self.lines = []
         self.texts = []
+        self.opacity = 0.8
+        self.cache = None  # pixmap과 선/텍스트를 합쳐 둔 래스터 캐시
+        self.cache_damage = QRegion()
+        # 클릭/커서 판정용 공간 색인 (cell_size는 문서 좌표, 화면에서 일정한 크기가 되게 문서 크기에 맞춰 줌)
+        self.line_index = SpatialGrid(cell_size)
+        self.text_index = SpatialGrid(cell_size)
+        self.segments = SegmentArray()  # 선 거리 계산용 NumPy 배열
+
+    @classmethod
+    def from_record(cls, record, **kwargs):
+        # 선/텍스트만 옮김, 래스터(pixmap, pyramid)는 부르는 쪽에서 채움
+        layer = cls(source_path=record.source_path, **kwargs)
+        layer.opacity = record.opacity
+        for line in record.lines:
+            layer.add_line(LineItem.from_record(line))
+        for text in record.texts:
+            layer.add_text(TextItem.from_record(text))
+        return layer
+
+    @property
+    def pixmap(self):
+        if self._pixmap is None and self.raster is not None:
+            raster = self.raster
+            data = raster.data()
+            image = QImage(data, raster.width, raster.height, raster.width * 4, QImage.Format_ARGB32_Premultiplied)
+            self._pixmap = QPixmap.fromImage(image)
+            del image
+            data.release()
+        return self._pixmap
+
+    def raster_data(self):
+        # 프로젝트에 쓸 (너비, 높이, 배율, 픽셀), 아직 꺼내지 않은 조각은 복사 없이 그대로 넘김
+        if self._pixmap is None:
+            raster = self.raster
+            if raster is None:
+                return None
+            return raster.width, raster.height, raster.scale, raster.data()
+        image = self._pixmap.toImage().convertToFormat(QImage.Format_ARGB32_Premultiplied)
+        return image.width(), image.height(), self.pixmap_scale, image.constBits().asstring(image.byteCount())
+
+    def record(self, name=''):
+        # 아이템의 기록을 그대로 담음 (따로 떼어 두려면 copy())
+        return LayerRecord(name, self.opacity, self.source_path,
+                           [line.record for line in self.lines], [text.record for text in self.texts])
+
+    def add_line(self, line):
+        self.lines.append(line)
+        self.index_item(line)
+
+    def add_text(self, text_item):
+        self.texts.append(text_item)
+        self.index_item(text_item)
+
+    def insert_item(self, item, index=None):
+        # 되돌리기에서 지웠던 자리에 다시 넣을 때 씀 (index가 None이면 맨 뒤)
+        items = self.lines if isinstance(item, LineItem) else self.texts
+        items.insert(len(items) if index is None else index, item)
+        self.index_item(item)
+
+    def item_index(self, item):
+        return (self.lines if isinstance(item, LineItem) else self.texts).index(item)
+
+    def remove_item(self, item):
+        if item in self.lines:
+            self.lines.remove(item)
+            self.line_index.remove(item)
+            self.segments.remove(item)
+        elif item in self.texts:
+            self.texts.remove(item)
+            self.text_index.remove(item)
+
+    def index_item(self, item):
+        # 위치나 내용이 바뀐 아이템의 색인을 갱신
+        if isinstance(item, LineItem):
+            self.line_index.update(item, rect_bounds(item.bounds()))
+            self.segments.set(item, line_vertices(item))
+        else:
+            self.text_index.update(item, rect_bounds(item.rect))
+
+    def lines_near(self, point, radius=0):
+        # 목록 순서(먼저 추가된 것 우선)대로 돌려줌
+        x, y = point.x(), point.y()
+        return sorted(self.line_index.query_rect(x - radius, y - radius, x + radius, y + radius), key=attrgetter('order'))
+
+    def texts_at(self, point):
+        return sorted(self.text_index.query_point(point.x(), point.y()), key=attrgetter('order'))
+
+    def set_cell_size(self, cell_size):
+        self.line_index.set_cell_size(cell_size)
+        self.text_index.set_cell_size(cell_size)
+
+    def invalidate(self, rect=None):
+        # rect가 None이면 캐시 전체를 버림
+        if rect is None:
+            self.cache = None
+        elif self.cache is not None and not rect.isEmpty():
+            self.cache_damage += rect
+
+    def release_caches(self):
+        # 실행 취소 기록에만 남은 레이어가 화면 캐시와 타일을 붙잡고 있지 않게 함
+        self.cache = None
+        if self.pyramid is not None:
+            for tiles in self.pyramid.levels.values():
+                tiles.clear()
+
+    def pixel_bytes(self):
+        return self._pixmap.width() * self._pixmap.height() * 4 if self._pixmap is not None else 0
+
+    def scroll(self, dx, dy, exposed):
+        # 화면 이동: 캐시를 밀고 새로 드러난 영역만 다시 그림
+        if self.cache is None:
+            return
+        scroll_buffer(self.cache, dx, dy)
+        self.cache_damage = self.cache_damage.translated(dx, dy) + exposed
+
+    def rendered(self, size, scale=1.0, offset=QPoint(), ratio=1.0):
+        # 캐시는 화면 크기(논리 좌표, 장치 배율 ratio), 화면 좌표 = 문서 좌표 * scale + offset
+        if self.cache is None or self.cache.size() != size * ratio or self.cache.devicePixelRatioF() != ratio:
+            self.cache = make_buffer(size, ratio)
+            self.cache_damage = QRegion(QRect(QPoint(), size))
+        if not self.cache_damage.isEmpty():
+            damage = self.cache_damage
+            self.cache_damage = QRegion()
+            painter = QPainter(self.cache)
+            painter.setClipRegion(damage)
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            painter.fillRect(damage.boundingRect(), Qt.transparent)
+            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+            self.paint(painter, damage.boundingRect(), scale, offset)
+            painter.end()
+        return self.cache
+
+    def paint(self, painter, clip, scale=1.0, offset=QPoint()):
+        # 불투명도를 요소마다 적용해 두므로 캐시는 그대로(불투명도 1로) 합성하면 됨
+        painter.setOpacity(self.opacity)
+        self.paint_raster(painter, clip, scale, offset)
+        self.paint_items(painter, clip, scale, offset)
+
+    def paint_raster(self, painter, clip, scale, offset):
+        # 대리 이미지보다 크게 볼 때만 (HiDPI는 장치 픽셀 기준) 피라미드에서 가까운 단계를 골라 그림
+        # 아직 없으면 대리 이미지를 늘림
+        ratio = painter.device().devicePixelRatioF()
+        if self.pyramid is not None and scale * ratio > self.pixmap_scale:
+            if self.pyramid.draw(painter, clip, scale, offset):
+                return
+        if self.pixmap is None:
+            return
+        if scale == self.pixmap_scale:
+            target = self.pixmap.rect().translated(offset).intersected(clip)
+            painter.drawPixmap(target, self.pixmap, target.translated(-offset))
+            return
+        painter.save()
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.translate(offset)
+        painter.scale(scale / self.pixmap_scale, scale / self.pixmap_scale)
+        painter.drawPixmap(0, 0, self.pixmap)
+        painter.restore()
+
+    def paint_items(self, painter, clip, scale=1.0, offset=QPoint(), layouts=None):
+        # clip은 출력 좌표, 선/텍스트는 문서 좌표이므로 clip을 문서 좌표로 바꿔 걸러냄
+        # layouts: 작업 스레드에서 그릴 때 쓰는 스레드 전용 TextLayoutCache
+        margin = DAMAGE_MARGIN / scale
+        clip = clip.translated(-offset)
+        doc_clip = QRectF(clip.x() / scale, clip.y() / scale, clip.width() / scale, clip.height() / scale)
+        doc_clip = doc_clip.adjusted(-margin, -margin, margin, margin).toAlignedRect()
+        # 문서 전체가 아니라 격자 색인에서 clip에 걸친 아이템만 꺼내고, 그리는 순서는 목록 순서대로
+        left, top, right, bottom = rect_bounds(doc_clip)
+        lines = sorted(self.line_index.query_rect(left, top, right, bottom), key=attrgetter('order'))
+        # 텍스트 색인은 글자 영역(rect)이라 bounds()의 여유만큼 넓혀서 찾음
+        texts = sorted(self.text_index.query_rect(left - 2, top - 2, right + 2, bottom + 2), key=attrgetter('order'))
+        painter.save()
+        painter.translate(offset)
+        painter.scale(scale, scale)
+        for line in lines:
+            if line.width * scale > 1:
+                # 굵은 선을 drawLine으로 그리면 clip에 따라 픽셀이 달라지므로 외곽 경로를 직접 채움
+                for path in line.outline():
+                    painter.fillPath(path, line.color)
+            else:
+                painter.setPen(line.pen())
+                painter.drawLine(line.start, line.mid)
+                painter.drawLine(line.mid, line.end)
+
+        for text_item in texts:
+            static_text, _ = text_item.layout(scale, layouts)
+            painter.setFont(text_item.current_font)
+            painter.setPen(text_item.color)
+            painter.drawStaticText(text_item.rect.topLeft(), static_text)
+        painter.restore()
 
 class TextItem:
+    # 문서 내용은 record(TextRecord)에 두고 편집기/그리기에는 Qt 형식으로 보여 줌
+    position = point_property('position')
+    color = color_property()
+
     def __init__(self, text, position, font, color):
-        self.text = text
-        self.position = position
-        self.current_font = font
-        self.color = color
+        self.wrap(TextRecord(text, point_tuple(position), font_spec(font), QColor(color).rgba()))
+
+    @classmethod
+    def from_record(cls, record):
+        item = cls.__new__(cls)
+        item.wrap(record)
+        return item
+
+    def wrap(self, record):
+        self.record = record
+        self.order = next(item_order)
         self.rect = None
+        self.prepared = None  # (캐시 키, (QStaticText, 영역)): 마지막으로 그린 배율의 글자 배치
         self.is_selected = False
+        self.update_layout()
+
+    @property
+    def text(self):
+        return self.record.text
+
+    @text.setter
+    def text(self, text):
+        self.record.text = text
+
+    @property
+    def current_font(self):
+        return qt_font(self.record.font)
+
+    @current_font.setter
+    def current_font(self, font):
+        self.record.font = font_spec(font)
+
+    def layout(self, scale=1.0, layouts=None):
+        # 글자 배치를 아이템에도 붙잡아 둠 -> 라벨이 공유 캐시 크기보다 많아도 다시 그릴 때마다 새로 준비하지 않음
+        # 키에 텍스트/글꼴/색/배율이 들어 있어 하나라도 바뀌면 새로 꺼냄
+        # layouts: 작업 스레드 전용 캐시 (QStaticText는 스레드끼리 나눠 쓰지 않으므로 아이템에 두지 않음)
+        if layouts is not None:
+            return layouts.layout(self.text, self.current_font, self.color, scale)
+        key = text_layouts.key(self.text, self.current_font, self.color, scale)
+        if self.prepared is None or self.prepared[0] != key:
+            self.prepared = (key, text_layouts.layout(self.text, self.current_font, self.color, scale))
+        return self.prepared[1]
+
+    def update_layout(self):
+        # 그리지 않고도 글자 영역을 구함 (텍스트나 글꼴이 바뀌면 다시 호출)
+        # 영역은 배율과 상관없으므로 그릴 때 붙잡아 둔 배치는 건드리지 않음
+        rect = text_layouts.layout(self.text, self.current_font, self.color)[1]
+        self.rect = rect.translated(QPointF(self.position))
+
+    def bounds(self):
+        return self.rect.toAlignedRect().adjusted(-2, -2, 2, 2)
 
 class LineItem:
-    def __init__(self, start, end, mid, color, is_dashed):
-        self.start = start
-        self.mid = mid
-        self.end = end
-        self.color = color
-        self.is_dashed = is_dashed
+    # 문서 내용은 record(LineRecord)에 두고 편집기/그리기에는 Qt 형식으로 보여 줌
+    start = point_property('start')
+    mid = point_property('mid')
+    end = point_property('end')
+    color = color_property()
+
+    def __init__(self, start, end, mid, color, is_dashed, width=1.0):
+        self.wrap(LineRecord(point_tuple(start), point_tuple(mid), point_tuple(end), QColor(color).rgba(), is_dashed, width))
+
+    @classmethod
+    def from_record(cls, record):
+        item = cls.__new__(cls)
+        item.wrap(record)
+        return item
+
+    def wrap(self, record):
+        self.record = record
+        self.order = next(item_order)
         self.is_selected = False
+        self.outline_key = None
+        self.outline_path = None
+
+    @property
+    def is_dashed(self):
+        return self.record.dashed
+
+    @is_dashed.setter
+    def is_dashed(self, is_dashed):
+        self.record.dashed = is_dashed
+
+    @property
+    def width(self):
+        return self.record.width
+
+    def outline(self):
+        # 두 선분을 채울 외곽 경로 (좌표나 모양이 바뀌었을 때만 다시 만듦)
+        record = self.record
+        key = record.key()
+        if key != self.outline_key:
+            stroker = QPainterPathStroker(self.pen())
+            paths = []
+            for a, b in ((record.start, record.mid), (record.mid, record.end)):
+                path = QPainterPath(QPointF(*a))
+                path.lineTo(QPointF(*b))
+                paths.append(stroker.createStroke(path))
+            self.outline_path = paths
+            self.outline_key = key
+        return self.outline_path
+
+    def pen(self):
+        pen = QPen(self.color, self.width)
+        if self.is_dashed:
+            pen.setStyle(Qt.DashLine)
+        return pen
+
+    def bounds(self):
+        # 선 두께까지 넣은 문서 좌표 영역 (선택 표시 여유는 화면으로 바꿀 때 더함)
+        # 두께는 확대하면 화면에서 몇십 픽셀이 되므로 화면 여유(DAMAGE_MARGIN)에 맡기지 않음
+        # 끝모양이 사각(SquareCap)이라 모서리가 각 축으로 두께의 1/√2까지 나감
+        left, top, right, bottom = self.record.bounds()
+        pad = math.ceil(self.width * math.sqrt(0.5))
+        return QRect(QPoint(left - pad, top - pad), QPoint(right + pad, bottom + pad))
+
+def paint_document(painter, layers, clip):
+    # layers: 아래부터 (레이어, 원본 해상도 래스터) 목록. 래스터는 TiledImage, QImage 또는 None
+    layouts = TextLayoutCache()  # QStaticText는 스레드끼리 나눠 쓰지 않음
+    for layer, raster in layers:
+        painter.setOpacity(layer.opacity)
+        if isinstance(raster, QImage):
+            source = clip.intersected(raster.rect())
+            painter.drawImage(source, raster, source)
+        elif raster is not None:
+            raster.draw(painter, clip)
+        layer.paint_items(painter, clip, layouts=layouts)
+
+class StripeTask(QRunnable):
+    # 내보내기 이미지의 가로 띠 하나를 그림
+    # 띠마다 따로 만든 작은 이미지에 그리면 장치 영역이 달라져 선 픽셀이 달라지므로,
+    # 같은 픽셀 버퍼를 가리키는 전체 크기 QImage를 스레드마다 따로 만들고 자기 띠로 clip해서 그림
+    def __init__(self, layers, buffer, size, bytes_per_line, rect):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.layers = layers
+        self.buffer = buffer
+        self.size = size
+        self.bytes_per_line = bytes_per_line
+        self.rect = rect
+
+    def run(self):
+        image = QImage(self.buffer, self.size.width(), self.size.height(), self.bytes_per_line,
+                       QImage.Format_ARGB32_Premultiplied)
+        painter = QPainter(image)
+        painter.setClipRect(self.rect)
+        paint_document(painter, self.layers, self.rect)
+        painter.end()
 
 class MyListWidget(QListWidget):
     item_moved = pyqtSignal(int, int)  # 시그널: (from_index, to_index)
@@ -87,7 +526,7 @@ class MyListWidget(QListWidget):
     def remove_current_item(self):
         current_row = self.currentRow()
         if current_row != -1:
-            self.takeItem(current_row)
+            self.removed_text = self.takeItem(current_row).text()  # 되돌릴 때 같은 이름으로 다시 넣도록
             self.item_moved.emit(current_row, -1)  # -1 indicates removal
 
     def add_item(self, text):
@@ -116,12 +555,33 @@ class EditableComboBox(QComboBox):
             self.setCurrentIndex(self.findText(str(self.parent().current_font.pointSize())))
 
 class ImageFileFilterProxyModel(QSortFilterProxyModel):
+    def __init__(self, thumbnailLoader=None, parent=None):
+        super().__init__(parent)
+        # 이미지 파일 아이콘 자리에 썸네일을 보여 줌 (보이는 줄만 data()가 불리므로 보이는 것만 만들어짐)
+        self.thumbnailLoader = thumbnailLoader
+        if thumbnailLoader is not None:
+            thumbnailLoader.ready.connect(self.onThumbnailReady)
+
     def filterAcceptsRow(self, source_row, source_parent):
         index = self.sourceModel().index(source_row, 0, source_parent)
         if self.sourceModel().isDir(index):
             return True
         file_name = self.sourceModel().fileName(index)
-        return bool(QRegExp.match(r".*\.(jpg|jpeg|png)$", file_name, QRegExp.IGNORECASE))
+        return bool(re.match(r".*\.(jpg|jpeg|png)$", file_name, re.IGNORECASE))
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DecorationRole and self.thumbnailLoader is not None and index.column() == 0:
+            source_index = self.mapToSource(index)
+            if not self.sourceModel().isDir(source_index):
+                pixmap = self.thumbnailLoader.pixmap(self.sourceModel().filePath(source_index))
+                if pixmap is not None:
+                    return QIcon(pixmap)
+        return super().data(index, role)
+
+    def onThumbnailReady(self, file_path):
+        index = self.mapFromSource(self.sourceModel().index(file_path))
+        if index.isValid():
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
 
 class ImageExplorerWidget(QWidget):
     # Define a custom signal that emits the file path as a string
@@ -140,12 +600,15 @@ class ImageExplorerWidget(QWidget):
         self.model = QFileSystemModel()
         self.model.setRootPath('')
 
-        self.proxyModel = ImageFileFilterProxyModel()
+        self.thumbnailLoader = ThumbnailLoader(self)
+        self.proxyModel = ImageFileFilterProxyModel(self.thumbnailLoader)
         self.proxyModel.setSourceModel(self.model)
         self.proxyModel.setFilterKeyColumn(0)  # Apply filter on the file names
 
         self.tree = QTreeView()
         self.tree.setModel(self.proxyModel)
+        self.tree.setIconSize(QSize(48, 48))
+        self.tree.setUniformRowHeights(True)  # 줄 높이를 줄마다 재지 않음 (수천 개 폴더에서 스크롤이 가벼움)
         self.tree.setRootIndex(self.proxyModel.mapFromSource(self.model.index('')))
         self.tree.setColumnWidth(0, 400)
 
@@ -155,25 +618,235 @@ class ImageExplorerWidget(QWidget):
 
         self.tree.doubleClicked.connect(self.onDoubleClick)
 
+        # 목록 보기와 썸네일 격자 보기를 버튼으로 바꿈
+        self.grid = ThumbnailGridView(self.thumbnailLoader)
+        self.grid.setModel(self.proxyModel)
+        self.grid.doubleClicked.connect(self.onGridDoubleClick)
+        self.grid.folder_activated.connect(self.grid.setRootIndex)
+
+        self.views = QStackedWidget()
+        self.views.addWidget(self.tree)
+        self.views.addWidget(self.grid)
+
+        self.viewToggle = QPushButton('격자 보기')
+        self.viewToggle.setCheckable(True)
+        self.viewToggle.toggled.connect(self.setGridMode)
+
+        browser = QWidget()
+        browserLayout = QVBoxLayout(browser)
+        browserLayout.setContentsMargins(0, 0, 0, 0)
+        browserLayout.addWidget(self.viewToggle)
+        browserLayout.addWidget(self.views)
+
         self.imageLabel = QLabel()
         self.imageLabel.setAlignment(Qt.AlignCenter)
         self.imageLabel.setMinimumSize(1, 1)
 
-        self.splitter.addWidget(self.tree)
+        self.splitter.addWidget(browser)
         self.splitter.addWidget(self.imageLabel)
 
+        self.fileDoubleClicked.connect(self.showImage)
+
     def onDoubleClick(self, index):
         # Map the proxy index to the source index
         source_index = self.proxyModel.mapToSource(index)
         file_path = self.model.filePath(source_index)
         self.fileDoubleClicked.emit(file_path)
 
+    def setGridMode(self, enabled):
+        if enabled:
+            # 목록에서 고른 폴더(파일이면 그 파일의 폴더)를 격자로 보여 줌
+            index = self.tree.currentIndex()
+            if index.isValid() and not self.model.isDir(self.proxyModel.mapToSource(index)):
+                index = index.parent()
+            self.grid.setRootIndex(index if index.isValid() else self.tree.rootIndex())
+        self.views.setCurrentWidget(self.grid if enabled else self.tree)
+
+    def onGridDoubleClick(self, index):
+        # 폴더는 격자 안에서 열고, 파일은 목록에서 더블클릭한 것과 같이 처리
+        if self.model.isDir(self.proxyModel.mapToSource(index)):
+            self.grid.setRootIndex(index)
+        else:
+            self.onDoubleClick(index)
+
+    def showImage(self, file_path):
+        # 미리보기 크기로 줄여서 디코딩
+        label_size = self.imageLabel.size()
+        image = image_cache.load(file_path, (label_size.width(), label_size.height()))
+        self.imageLabel.setPixmap(QPixmap.fromImage(image))
+
+class CanvasWidget(QWidget):
+    # 편집기의 백 버퍼(canvas)를 보여 주는 위젯, update(영역)으로 바뀐 곳만 다시 그림
+    def __init__(self, editor, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.setMouseTracking(True)
+
+    def paintEvent(self, event):
+        canvas = self.editor.canvas
+        if canvas.devicePixelRatioF() != self.devicePixelRatioF():
+            # 다른 배율의 화면으로 옮겨졌으면 버퍼를 새 배율로 다시 만듦
+            QTimer.singleShot(0, self.editor.update_device_ratio)
+        painter = QPainter(self)
+        painter.setClipRegion(event.region())
+        blit(painter, event.rect(), canvas)
+        painter.setPen(Qt.black)
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+        painter.end()
+
+    def mousePressEvent(self, event):
+        self.editor.mousePressEvent(event)
+
+    def mouseMoveEvent(self, event):
+        self.editor.mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        self.editor.mouseReleaseEvent(event)
+
+    def mouseDoubleClickEvent(self, event):
+        self.editor.mouseDoubleClickEvent(event)
+
+    def wheelEvent(self, event):
+        self.editor.wheelEvent(event)
+
+class AddItemsCommand(Command):
+    def __init__(self, editor, layer, items):
+        self.editor = editor
+        self.layer = layer
+        self.items = items
+
+    def redo(self):
+        for item in self.items:
+            self.layer.insert_item(item)
+            self.editor.invalidate(item.bounds(), self.layer)
+
+    def undo(self):
+        for item in self.items:
+            self.editor.invalidate(item.bounds(), self.layer)
+            self.layer.remove_item(item)
+
+    def size(self):
+        return ITEM_BYTES * len(self.items)
+
+class RemoveItemsCommand(Command):
+    def __init__(self, editor, layer, items):
+        self.editor = editor
+        self.layer = layer
+        # 원래 순서대로 되살리기 위해 목록에서의 자리를 기억함 (앞자리부터 넣어야 뒷자리가 맞음)
+        self.entries = sorted(((layer.item_index(item), item) for item in items), key=lambda entry: entry[0])
+
+    def redo(self):
+        for _, item in self.entries:
+            self.editor.invalidate(item.bounds(), self.layer)
+            self.layer.remove_item(item)
+
+    def undo(self):
+        for index, item in self.entries:
+            self.layer.insert_item(item, index)
+            self.editor.invalidate(item.bounds(), self.layer)
+
+    def size(self):
+        return ITEM_BYTES * len(self.entries)
+
+class ChangeItemsCommand(Command):
+    # 아이템 기록 필드의 이전/새 값만 들고 있음, 같은 끌기(gesture) 동안의 명령은 하나로 합침
+    def __init__(self, editor, changes, gesture=None):
+        self.editor = editor
+        self.changes = changes  # (레이어, 아이템, 필드, 이전 값, 새 값)
+        self.gesture = gesture
+
+    def apply(self, values):
+        editor = self.editor
+        for (layer, item, field, _, _), value in zip(self.changes, values):
+            editor.invalidate(item.bounds(), layer)
+            if isinstance(item, TextItem):
+                if field != 'position':
+                    text_layouts.discard(item.text, item.current_font, item.color)
+                setattr(item.record, field, value)
+                item.update_layout()
+            else:
+                setattr(item.record, field, value)
+            if layer is not None:
+                layer.index_item(item)
+            editor.invalidate(item.bounds(), layer)
+
+    def redo(self):
+        self.apply([change[4] for change in self.changes])
+
+    def undo(self):
+        self.apply([change[3] for change in self.changes])
+
+    def targets(self):
+        return [(item, field) for _, item, field, _, _ in self.changes]
+
+    def merge(self, other):
+        if self.gesture is None or not isinstance(other, ChangeItemsCommand) or other.gesture != self.gesture \
+                or other.targets() != self.targets():
+            return False
+        self.changes = [mine[:4] + (theirs[4],) for mine, theirs in zip(self.changes, other.changes)]
+        return True
+
+    def size(self):
+        return CHANGE_BYTES * len(self.changes)
+
+class RemoveLayerCommand(Command):
+    def __init__(self, editor, index, name):
+        self.editor = editor
+        self.index = index
+        self.layer = editor.layers[index]
+        self.name = name
+        self.removed = False
+
+    def redo(self):
+        editor = self.editor
+        del editor.layers[self.index]
+        if editor.layer_list.count() > len(editor.layers):
+            editor.layer_list.takeItem(self.index)  # 목록에서 지워서 불린 경우는 이미 빠져 있음
+        self.layer.release_caches()
+        self.removed = True
+        editor.invalidate_split()
+
+    def undo(self):
+        editor = self.editor
+        editor.layers.insert(self.index, self.layer)
+        item = QListWidgetItem(self.name)
+        item.setFlags(item.flags() | Qt.ItemIsEditable)
+        editor.layer_list.insertItem(self.index, item)
+        self.removed = False
+        editor.invalidate_split()
+
+    def size(self):
+        # 지운 레이어의 픽셀은 복사하지 않고 그대로 들고 있지만 그만큼은 기록이 붙잡고 있는 메모리
+        layer = self.layer
+        return ITEM_BYTES * (len(layer.lines) + len(layer.texts) + 1) + layer.pixel_bytes()
+
+    def discard(self, applied):
+        if applied and self.layer.pyramid is not None:
+            self.layer.pyramid.setParent(None)  # 편집기에 매달린 피라미드도 함께 정리되게 함
+
 class ImageEditor(QMainWindow):
     IMAGE_SIZE = (800, 600)
+    PICK_THRESHOLD = 5  # 선을 클릭으로 고를 수 있는 거리 (픽셀)
+    MAX_FPS = 60  # 화면 갱신 최대 횟수 (초당)
+    FONT_CACHE_FILE = 'korean_fonts.json'
+    TILE_CACHE_DIR = 'tiles'
+    EXPORT_STRIPE_HEIGHT = 256  # 타일 한 줄 높이와 같게 두어 띠마다 타일 줄 하나만 읽음
+    MAX_ZOOM = 8.0  # 화면 픽셀 / 문서 픽셀
+    ZOOM_STEP = 1.25
+    PROJECT_SUFFIX = '.imgproj'
+    UNDO_BYTES = 64 * 1024 * 1024  # 실행 취소 기록이 붙잡아 둘 수 있는 최대 메모리
+    INDEX_CELL_SIZE = 64  # 공간 색인 한 칸의 크기 (맞춤 배율에서의 화면 픽셀)
     def __init__(self):
         super().__init__()
+        # 시작 단계별 소요 시간 (ms)
+        self.startup_timings = OrderedDict()
+        self.startup_clock = time.perf_counter()
+        self.font_fingerprint = None
         self.layers = []
         self.current_layer = None
+        self.project = None  # 지금 열려 있는 프로젝트 파일 (레이어 픽셀을 여기서 꺼냄)
+        self.history = UndoStack(self.UNDO_BYTES)
+        self.gesture = 0  # 마우스를 누를 때마다 늘림, 같은 끌기 동안의 명령을 합치는 데 씀
         self.drawing = False
         self.adding_text = False
         self.moving_text = False
@@ -181,13 +854,46 @@ class ImageEditor(QMainWindow):
         self.selected_texts = set()
         self.selected_line = None
         self.moving_vertex = None
+        self.drag_layer = None
         self.points = []
         self.temp_line = None
+        # 선/텍스트 좌표는 원본 해상도의 문서 좌표, 화면 좌표 = 문서 좌표 * view_scale + view_offset
+        self.document_size = QSize(*self.IMAGE_SIZE)
+        self.fit_scale = 1.0  # 문서 전체가 화면에 맞는 배율 (대리 이미지 배율)
+        self.view_scale = 1.0
+        self.view_offset = QPoint()
+        self.pan_start = None
+        self.canvas_rect = QRect(0, 0, *self.IMAGE_SIZE)  # 캔버스 논리 좌표 영역
+        self.device_ratio = 1.0
+        self.canvas = make_buffer(self.canvas_rect.size())  # 화면에 보이는 백 버퍼 (문서 + 오버레이)
+        self.document_buffer = make_buffer(self.canvas_rect.size())  # 레이어만 합성해 둔 문서 이미지
+        self.damage = QRegion(self.canvas_rect)  # 문서가 바뀐 영역
+        self.overlay_damage = QRegion()  # 미리보기/선택 표시만 바뀐 영역
+        # 현재 레이어 아래/위 레이어들을 미리 합성해 둔 버퍼
+        self.below_buffer = None
+        self.above_buffer = None
+        self.split_layer = None
+        self.split_damage = QRegion()
+        # 다시 그리기 요청을 모아 프레임마다 한 번만 그림
+        self.max_fps = self.MAX_FPS
+        self.last_frame_time = 0.0
+        self.repaint_timer = QTimer(self)
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.timeout.connect(self.render_frame)
+        # merged: 이미 예약된 프레임에 합쳐진 요청, dropped: 그릴 것이 없어 건너뛴 프레임
+        self.repaint_stats = {'requested': 0, 'merged': 0, 'dropped': 0, 'rendered': 0}
+        self.cursor_shape = None
         self.line_color = QColor(Qt.blue)
         self.current_font_color = QColor(Qt.blue)
         self.current_font = QFont("굴림", pointSize=12, weight=1)
+        self.mark_startup('state')
         self.initUI()
 
+    def mark_startup(self, stage):
+        now = time.perf_counter()
+        self.startup_timings[stage] = (now - self.startup_clock) * 1000
+        self.startup_clock = now
+
     def initUI(self):
         self.setWindowTitle('이미지 편집기')
 
@@ -210,9 +916,11 @@ class ImageEditor(QMainWindow):
 
         self.toolbar.addSeparator()
 
+        self.mark_startup('toolbar')
         self.font_family_combo = QComboBox(self)
-        self.font_family_combo.addItems(self.get_korean_fonts())
+        self.font_family_combo.addItems(self.load_korean_fonts())
         self.font_family_combo.setCurrentText("굴림")
+        self.mark_startup('fonts')
         self.font_family_combo.currentTextChanged.connect(self.change_font_family)
         self.toolbar.addWidget(self.font_family_combo)
 
@@ -299,14 +1007,9 @@ class ImageEditor(QMainWindow):
         
         # 이미지 편집 영역
         editor_layout = QHBoxLayout()
-        self.image_label = QLabel()
-        self.image_label.setFixedSize(*self.IMAGE_SIZE)
-        self.image_label.setAlignment(Qt.AlignCenter)
-        self.image_label.setStyleSheet("border: 1px solid black;")
-        self.image_label.setMouseTracking(True)
-        self.image_label.mousePressEvent = self.mousePressEvent
-        self.image_label.mouseMoveEvent = self.mouseMoveEvent
-        editor_layout.addWidget(self.image_label)
+        self.canvas_widget = CanvasWidget(self)
+        self.canvas_widget.setFixedSize(*self.IMAGE_SIZE)
+        editor_layout.addWidget(self.canvas_widget)
         
         main_layout.addLayout(controls_layout)
         main_layout.addLayout(editor_layout)
@@ -325,34 +1028,184 @@ class ImageEditor(QMainWindow):
         save_action.triggered.connect(self.save_image)
         file_menu.addAction(save_action)
 
-        self.image_label.mouseDoubleClickEvent = self.mouseDoubleClickEvent
-        self.image_label.mouseReleaseEvent = self.mouseReleaseEvent
+        file_menu.addSeparator()
+        open_project_action = QAction('프로젝트 열기', self)
+        open_project_action.triggered.connect(self.open_project)
+        file_menu.addAction(open_project_action)
+
+        save_project_action = QAction('프로젝트 저장', self)
+        save_project_action.triggered.connect(self.save_project)
+        file_menu.addAction(save_project_action)
+
+        edit_menu = menubar.addMenu('편집')
+        undo_action = QAction('실행 취소', self)
+        undo_action.setShortcut(QKeySequence.Undo)
+        undo_action.triggered.connect(self.undo)
+        edit_menu.addAction(undo_action)
+
+        redo_action = QAction('다시 실행', self)
+        redo_action.setShortcut(QKeySequence.Redo)
+        redo_action.triggered.connect(self.redo)
+        edit_menu.addAction(redo_action)
+
+        self.update_device_ratio()
 
         # 키 이벤트를 처리하기 위해 포커스 정책 설정
         self.setFocusPolicy(Qt.StrongFocus)
 
+        # 이미지는 작업 스레드에서 읽고, 진행 상태는 상태 표시줄에 보여 줌
+        # 같은 파일을 다시 열거나 탐색기에서 본 크기 그대로 열면 디코딩 없이 공유 캐시에서 꺼냄
+        self.image_loader = ImageLoader(self, cache=image_cache)
+        self.image_loader.loaded.connect(self.on_image_loaded)
+        self.image_loader.failed.connect(self.on_image_failed)
+        self.image_loader.progress.connect(self.on_load_progress)
+        self.load_errors = []
+        self.load_progress = QProgressBar()
+        self.load_progress.setMaximumWidth(200)
+        self.cancel_load_btn = QPushButton('취소')
+        self.cancel_load_btn.clicked.connect(lambda: self.image_loader.cancel())  # clicked가 넘기는 checked를 job_id로 받지 않게 함
+        self.statusBar().addPermanentWidget(self.load_progress)
+        self.statusBar().addPermanentWidget(self.cancel_load_btn)
+        self.load_progress.hide()
+        self.cancel_load_btn.hide()
+        self.mark_startup('widgets')
+
     # 새로운 메서드들
     def new_document(self):
+        self.clear_document()
+        self.set_document_size(QSize(*self.IMAGE_SIZE))
+        self.invalidate_split()
+        self.update_image()
+
+    def clear_document(self):
+        self.unselect()
+        for layer in self.layers:
+            # 피라미드가 편집기에 매달려 있으면 창을 닫을 때까지 타일 메모리 맵과 캐시가 남음
+            layer.release_caches()
+            if layer.pyramid is not None:
+                layer.pyramid.setParent(None)
         self.layers = []
         self.layer_list.clear()
         self.current_layer = None
+        self.split_layer = None
+        self.history.clear()
+        if self.project is not None:
+            self.project.close()
+            self.project = None
+
+    def open_project(self):
+        file_name, _ = QFileDialog.getOpenFileName(self, "프로젝트 열기", "", f"프로젝트 (*{self.PROJECT_SUFFIX})")
+        if file_name:
+            self.load_project(file_name)
+
+    def load_project(self, file_name):
+        # 색인만 읽고 레이어 픽셀은 처음 그릴 때 메모리 맵에서 꺼냄
+        try:
+            project = ProjectFile(file_name)
+        except (OSError, ValueError) as e:
+            self.statusBar().showMessage(str(e), 5000)
+            return False
+        self.image_loader.cancel()
+        self.clear_document()
+        self.project = project
+        document = project.document
+        self.set_document_size(QSize(document.width, document.height))
+        for record, raster in zip(document.layers, project.rasters):
+            layer = Layer.from_record(record, pixmap_scale=raster.scale if raster else self.fit_scale, raster=raster,
+                                      cell_size=self.index_cell_size())
+            self.insert_layer(layer, record.name)
+        self.statusBar().showMessage(f"프로젝트를 열었습니다: {os.path.basename(file_name)}", 3000)
+        return True
+
+    def save_project(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, "프로젝트 저장", "", f"프로젝트 (*{self.PROJECT_SUFFIX})")
+        if file_name:
+            if not file_name.endswith(self.PROJECT_SUFFIX):
+                file_name += self.PROJECT_SUFFIX
+            self.write_project(file_name)
+
+    def write_project(self, file_name):
+        # 임시 파일에 다 쓴 뒤 바꿔치기 (지금 연 프로젝트에 덮어쓸 때 아직 안 꺼낸 픽셀은 옛 파일에서 바로 복사)
+        # 실패하면 임시 파일을 지우고, 아직 꺼내지 않은 픽셀이 남아 있는 옛 프로젝트는 열린 채로 둠
+        layers = self.layers[::-1]
+        temp_name = f'{file_name}.part'
+        old = self.project
+        # Windows는 맵이 열린 파일을 바꿀 수 없어 같은 파일에 덮어쓸 때만 먼저 닫음
+        # (다른 곳에서는 바꿔치기한 뒤에도 옛 맵이 옛 내용을 그대로 가리킴)
+        close_old = os.name == 'nt' and old is not None and \
+            os.path.normcase(os.path.abspath(old.path)) == os.path.normcase(os.path.abspath(file_name))
+        replaced = False
+        try:
+            write_project(temp_name, self.document(), (layer.raster_data() for layer in layers))
+            if close_old:
+                old.close()
+            os.replace(temp_name, file_name)
+            replaced = True
+            project = ProjectFile(file_name)
+        except (OSError, ValueError) as e:
+            if not replaced:
+                try:
+                    os.remove(temp_name)
+                except OSError:
+                    pass
+                if close_old:
+                    old.reopen()
+            self.statusBar().showMessage(f"프로젝트를 저장할 수 없습니다: {e}", 5000)
+            return False
+        if old is not None and not close_old:
+            old.close()
+        self.project = project
+        # 픽셀을 아직 꺼내지 않은 레이어는 새 파일의 조각을 가리키게 함
+        for layer, raster in zip(layers, self.project.rasters):
+            layer.raster = raster
+        self.statusBar().showMessage(f"프로젝트를 저장했습니다: {os.path.basename(file_name)}", 3000)
+        return True
 
     def keyPressEvent(self, event: QKeyEvent):
         if event.key() == Qt.Key_Delete:
             self.delete_selected_items()
+        elif event.key() == Qt.Key_0 and event.modifiers() & Qt.ControlModifier:
+            self.zoom_to(self.fit_scale)
+        elif event.key() == Qt.Key_Escape and self.image_loader.is_busy():
+            self.image_loader.cancel()
 
     def delete_selected_items(self):
         if self.current_layer:
-            # 선택된 선 삭제
-            if self.selected_line:
-                self.current_layer.lines.remove(self.selected_line)
-                self.selected_line = None
+            # 현재 레이어에 있는 선택된 선과 텍스트를 지움
+            layer = self.current_layer
+            items = [text for text in self.selected_texts if text in layer.texts]
+            if self.selected_line in layer.lines:
+                items.append(self.selected_line)
+            self.unselect()
+            if items:
+                self.execute(RemoveItemsCommand(self, layer, items))
+            self.update_image()
+
+    def execute(self, command):
+        command.redo()
+        self.history.push(command)
+
+    def change_items(self, changes, gesture=None):
+        # changes: (레이어, 아이템, 기록 필드, 새 값), 실제로 바뀌는 것만 명령으로 만듦
+        changes = [(layer, item, field, getattr(item.record, field), value) for layer, item, field, value in changes
+                   if getattr(item.record, field) != value]
+        if changes:
+            self.execute(ChangeItemsCommand(self, changes, gesture))
+
+    def undo(self):
+        # 되돌린 아이템이 선택된 채로 남지 않도록 선택을 먼저 풂
+        self.unselect()
+        self.moving_text = False
+        self.moving_vertex = None
+        if self.history.undo():
+            self.update_image()
 
-            # 선택된 텍스트 삭제
-            for text in list(self.selected_texts):
-                if text in self.current_layer.texts:
-                    self.current_layer.texts.remove(text)
-            self.selected_texts.clear()
+    def redo(self):
+        self.unselect()
+        self.moving_text = False
+        self.moving_vertex = None
+        if self.history.redo():
+            self.update_image()
 
     def change_font_family(self):
         font_family = self.font_family_combo.currentText()
@@ -387,6 +1240,57 @@ class ImageEditor(QMainWindow):
                     korean_fonts.append(font)
         return korean_fonts
 
+    def font_cache_path(self):
+        directory = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+        return os.path.join(directory, 'image_editor', self.FONT_CACHE_FILE)
+
+    def tile_cache_dir(self):
+        directory = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+        return os.path.join(directory, 'image_editor', self.TILE_CACHE_DIR)
+
+    def current_font_fingerprint(self):
+        # 설치된 글꼴 목록이 바뀌었는지만 확인 (글꼴별 문자 체계는 보지 않음)
+        families = QFontDatabase().families()
+        return hashlib.sha1('\n'.join(families).encode('utf-8')).hexdigest()
+
+    def load_korean_fonts(self):
+        # 디스크 캐시가 있으면 바로 쓰고, 캐시가 맞는지는 창이 뜬 뒤에 확인함
+        try:
+            with open(self.font_cache_path(), encoding='utf-8') as f:
+                cache = json.load(f)
+            self.font_fingerprint = cache['fingerprint']
+            QTimer.singleShot(0, self.refresh_font_cache)
+            return cache['fonts']
+        except (OSError, ValueError, KeyError):
+            self.font_fingerprint = self.current_font_fingerprint()
+            fonts = self.get_korean_fonts()
+            self.save_font_cache(fonts)
+            return fonts
+
+    def save_font_cache(self, fonts):
+        path = self.font_cache_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': self.font_fingerprint, 'fonts': fonts}, f, ensure_ascii=False)
+        except OSError:
+            pass
+
+    def refresh_font_cache(self):
+        start = time.perf_counter()
+        fingerprint = self.current_font_fingerprint()
+        if fingerprint != self.font_fingerprint:
+            self.font_fingerprint = fingerprint
+            fonts = self.get_korean_fonts()
+            self.save_font_cache(fonts)
+            current = self.font_family_combo.currentText()
+            self.font_family_combo.blockSignals(True)
+            self.font_family_combo.clear()
+            self.font_family_combo.addItems(fonts)
+            self.font_family_combo.setCurrentText(current)
+            self.font_family_combo.blockSignals(False)
+        self.startup_timings['font_refresh'] = (time.perf_counter() - start) * 1000
+
     def change_font_style(self, style):        
         if style == "Bold":
             self.current_font.setBold(True)
@@ -407,16 +1311,49 @@ class ImageEditor(QMainWindow):
     def update_selected_text_style(self):
         if not self.selected_texts:
             return
+        font = font_spec(self.document_font())
+        color = QColor(self.current_font_color).rgba()
+        changes = []
         for text_item in self.selected_texts:
-            text_item.current_font = QFont(self.current_font)
-            text_item.color = QColor(self.current_font_color)
+            layer = self.layer_of(text_item)
+            changes += [(layer, text_item, 'font', font), (layer, text_item, 'color', color)]
+        self.change_items(changes)
+        self.update_image()
 
     def open_image(self):
-        file_name, _ = QFileDialog.getOpenFileName(self, "이미지 열기", "", "이미지 파일 (*.png *.jpg *.bmp *.jpeg)")
-        if file_name:
-            pixmap = QPixmap(file_name)
-            scaled_pixmap = self.scale_pixmap(pixmap)
-            self.add_layer(scaled_pixmap)
+        file_names, _ = QFileDialog.getOpenFileNames(self, "이미지 열기", "", "이미지 파일 (*.png *.jpg *.bmp *.jpeg)")
+        if file_names and not self.layers and not self.image_loader.is_busy():
+            # 빈 문서에 처음 여는 이미지의 원본 크기를 문서 크기로 씀 (헤더만 읽음)
+            self.set_document_size(QImageReader(file_names[0]).size())
+        size = self.fit_size()
+        for file_name in file_names:
+            self.image_loader.load(file_name, (size.width(), size.height()))
+
+    def on_image_loaded(self, job_id, file_name, image):
+        # QPixmap 변환은 GUI 스레드에서만 할 수 있음
+        pixmap = QPixmap.fromImage(image)
+        size = self.fit_size()
+        if pixmap.width() > size.width() or pixmap.height() > size.height():
+            # 읽는 사이에 문서 크기가 바뀐 경우
+            pixmap = pixmap.scaled(size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self.add_layer(pixmap, source_path=file_name)
+
+    def on_image_failed(self, job_id, file_name, message):
+        self.load_errors.append(os.path.basename(file_name))
+
+    def on_load_progress(self, done, total):
+        busy = self.image_loader.is_busy()
+        self.load_progress.setVisible(busy)
+        self.cancel_load_btn.setVisible(busy)
+        if busy:
+            self.load_progress.setRange(0, total)
+            self.load_progress.setValue(done)
+            self.statusBar().showMessage(f"이미지 불러오는 중... ({done}/{total})")
+        elif self.load_errors:
+            self.statusBar().showMessage(f"이미지를 읽을 수 없습니다: {', '.join(self.load_errors)}", 5000)
+            self.load_errors = []
+        else:
+            self.statusBar().clearMessage()
 
     def save_image(self):
         if not self.layers:
@@ -424,26 +1361,173 @@ class ImageEditor(QMainWindow):
         self.unselect()
         file_name, _ = QFileDialog.getSaveFileName(self, "이미지 저장", "", "PNG (*.png);;JPEG (*.jpg *.jpeg);;BMP (*.bmp)")
         if file_name:
-            self.image_label.pixmap().save(file_name, quality=50)
+            self.render_document().save(file_name, quality=50)
 
-    def scale_pixmap(self, pixmap):
-        return pixmap.scaled(QSize(*self.IMAGE_SIZE), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    def render_document(self, threads=None):
+        # 원본 해상도로 다시 합성함 (선택 표시 같은 오버레이는 넣지 않음)
+        # 가로 띠마다 작업 스레드가 같은 버퍼의 자기 줄만 그리므로 한 번에 그린 것과 같은 픽셀
+        layers = [(layer, self.export_raster(layer)) for layer in self.layers[::-1]]
+        for layer in self.layers:
+            for line in layer.lines:
+                line.outline()  # 작업 스레드는 만들어 둔 경로를 읽기만 함
+        image = QImage(self.document_size, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        buffer = image.bits()
+        width, height = image.width(), image.height()
+        stripe = self.EXPORT_STRIPE_HEIGHT
+        tasks = [StripeTask(layers, buffer, image.size(), image.bytesPerLine(), QRect(0, top, width, min(stripe, height - top)))
+                 for top in range(0, height, stripe)]
+        pool = QThreadPool()
+        if threads:
+            pool.setMaxThreadCount(threads)
+        for task in tasks:
+            pool.start(task)
+        pool.waitForDone()
+        return image
+
+    def export_raster(self, layer):
+        # 래스터 준비는 GUI 스레드에서 (QPixmap은 작업 스레드에서 쓸 수 없음)
+        tiles = layer.pyramid.level(0, wait=True) if layer.pyramid else None
+        if tiles is not None:
+            return tiles
+        return self.source_image(layer)
+
+    def document(self):
+        # 지금 문서를 Qt 없이 쓰는 기록으로 (레이어는 아래부터, 이름은 레이어 목록의 글자)
+        names = [self.layer_list.item(row).text() for row in range(self.layer_list.count())]
+        layers = [layer.record(names[row] if row < len(names) else '') for row, layer in enumerate(self.layers)]
+        return Document(self.document_size.width(), self.document_size.height(), layers[::-1])
+
+    def source_image(self, layer):
+        if layer.pixmap is None:
+            return None
+        # 원본 파일이 없으면 대리 이미지를 문서 배율로 늘림
+        proxy = layer.pixmap.size()
+        return layer.pixmap.toImage().scaled(round(proxy.width() / layer.pixmap_scale), round(proxy.height() / layer.pixmap_scale),
+                                             Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+    def set_document_size(self, size):
+        if not size.isValid():
+            return
+        width, height = self.IMAGE_SIZE
+        self.document_size = QSize(size)
+        self.fit_scale = min(width / size.width(), height / size.height())
+        for layer in self.layers:
+            layer.set_cell_size(self.index_cell_size())
+        self.set_view(self.fit_scale, QPoint())
+
+    def index_cell_size(self):
+        # 원본 해상도 문서 좌표로 고정 크기 칸을 쓰면 큰 문서에서 긴 선 하나가 수만 칸에 걸침
+        return self.INDEX_CELL_SIZE / self.fit_scale
+
+    def fit_size(self):
+        size = self.document_size
+        return QSize(round(size.width() * self.fit_scale), round(size.height() * self.fit_scale))
+
+    def set_view(self, scale, offset):
+        # 배율이 바뀌면 모든 캐시를 다시 그림 (이동만 할 때는 pan_by)
+        self.view_scale = scale
+        self.view_offset = QPoint(offset)
+        for layer in self.layers:
+            layer.invalidate()
+        self.invalidate_split()
+
+    def zoom_to(self, scale, anchor=None):
+        # anchor(화면 좌표) 아래의 문서 지점이 그대로 있도록 확대/축소
+        scale = max(self.fit_scale / 4, min(self.MAX_ZOOM, scale))
+        if abs(scale - self.fit_scale) < self.fit_scale * 1e-6:
+            scale = self.fit_scale
+        if anchor is None:
+            self.set_view(scale, QPoint())
+        else:
+            doc_x = (anchor.x() - self.view_offset.x()) / self.view_scale
+            doc_y = (anchor.y() - self.view_offset.y()) / self.view_scale
+            self.set_view(scale, QPoint(round(anchor.x() - doc_x * scale), round(anchor.y() - doc_y * scale)))
+        self.update_image()
+
+    def pan_by(self, dx, dy):
+        # 이미 그린 화면은 밀어서 재사용하고 새로 드러난 띠만 다시 그림
+        if not dx and not dy:
+            return
+        self.view_offset += QPoint(dx, dy)
+        if (dx * self.device_ratio) % 1 or (dy * self.device_ratio) % 1:
+            # 장치 픽셀로 딱 떨어지지 않게 밀리면 (배율 1.5 등) 전체를 다시 그림
+            self.set_view(self.view_scale, self.view_offset)
+            self.update_image()
+            return
+        rect = self.canvas_rect
+        exposed = QRegion(rect) - QRegion(rect.translated(dx, dy))
+        for layer in self.layers:
+            layer.scroll(dx, dy, exposed)
+        for buffer in (self.canvas, self.document_buffer, self.below_buffer, self.above_buffer):
+            if buffer is not None:
+                scroll_buffer(buffer, dx, dy)
+        self.split_damage = self.split_damage.translated(dx, dy) + exposed
+        self.damage = self.damage.translated(dx, dy) + exposed
+        self.overlay_damage = self.overlay_damage.translated(dx, dy)
+        self.update_image()
 
-    def add_layer(self, pixmap=None):
-        if pixmap is None:
-            pixmap = QPixmap(*self.IMAGE_SIZE)
-            pixmap.fill(Qt.transparent)
-        layer = Layer(pixmap=pixmap)
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        if steps:
+            self.zoom_to(self.view_scale * self.ZOOM_STEP ** steps, event.pos())
+
+    def document_font(self):
+        # 툴바의 글꼴 크기는 맞춤 배율 화면 기준이므로 문서 배율에 맞춰 키움
+        font = QFont(self.current_font)
+        font.setPointSizeF(self.current_font.pointSizeF() / self.fit_scale)
+        return font
+
+    def to_document(self, pos):
+        x = (pos.x() - self.view_offset.x()) / self.view_scale
+        y = (pos.y() - self.view_offset.y()) / self.view_scale
+        return QPoint(round(x), round(y))
+
+    def to_display(self, point):
+        scale = self.view_scale
+        return QPointF(point.x() * scale + self.view_offset.x(), point.y() * scale + self.view_offset.y())
+
+    def display_rect(self, rect):
+        scale = self.view_scale
+        return QRectF(rect.x() * scale + self.view_offset.x(), rect.y() * scale + self.view_offset.y(),
+                      rect.width() * scale, rect.height() * scale)
+
+    def damage_rect(self, rect):
+        # 문서 좌표 영역을 화면 좌표로 바꾸고 선 두께/핸들 여유를 더함
+        if rect.isEmpty():
+            return QRect()
+        return self.display_rect(rect).toAlignedRect().adjusted(-DAMAGE_MARGIN, -DAMAGE_MARGIN, DAMAGE_MARGIN, DAMAGE_MARGIN)
+
+    def add_layer(self, pixmap=None, source_path=None):
+        self.insert_layer(Layer(pixmap=pixmap, source_path=source_path, pixmap_scale=self.fit_scale,
+                                cell_size=self.index_cell_size()))
+
+    def insert_layer(self, layer, name=None):
+        # 맨 위에 넣음
+        source_path = layer.source_path
+        if source_path and os.path.exists(source_path):
+            size = QImageReader(source_path).size().scaled(self.document_size, Qt.KeepAspectRatio)
+            layer.pyramid = ImagePyramid(source_path, size, self.tile_cache_dir(), parent=self)
+            # 확대용 단계가 다 만들어지면 그 레이어를 다시 그림
+            layer.pyramid.level_ready.connect(lambda level, layer=layer: self.on_pyramid_level(layer))
         self.layers.append(layer)
-        self.layer_list.addItem(f"레이어 {len(self.layers)}")
+        self.layer_list.addItem(name or f"레이어 {len(self.layers)}")
         if len(self.layer_list) > 1:
             self.layer_list.move_item(len(self.layer_list)-1, 0)
         self.current_layer = layer
+        self.invalidate_split()
+        self.update_image()
+
+    def on_pyramid_level(self, layer):
+        if layer in self.layers:
+            self.invalidate(layer=layer)
+            self.update_image()
 
     def select_layer(self, item):
         index = self.layer_list.row(item)
         if 0 <= index < len(self.layers):
             self.current_layer = self.layers[index]
+            self.invalidate_split()
 
     def start_drawing_line(self):
         self.drawing = True
@@ -466,22 +1550,30 @@ class ImageEditor(QMainWindow):
         if from_index == -1:  # 새 아이템 추가
             self.add_layer()
         elif to_index == -1:  # 아이템 제거
-            del self.layers[from_index]
+            self.execute(RemoveLayerCommand(self, from_index, self.layer_list.removed_text))
         else:  # 아이템 이동
             item = self.layers.pop(from_index)
             self.layers.insert(to_index, item)
+        self.invalidate_split()
+        self.update_image()
 
     def mousePressEvent(self, event: QMouseEvent):
+        if event.button() == Qt.MiddleButton:
+            self.pan_start = event.pos()
+            return
+        self.gesture += 1
+        pos = self.to_document(event.pos())
         if self.drawing:
-            self.points.append(event.pos())
+            self.points.append(pos)
             if len(self.points) == 3:
                 text, ok = QInputDialog.getText(self, "텍스트 입력", "텍스트:")
                 if ok:
                     line_type = self.line_type_combo.currentText()
-                    new_line = LineItem(self.points[0], self.points[1], self.points[2], QColor(self.line_color), line_type=="─ ─ ─")
-                    self.current_layer.lines.append(new_line)
-                    self.current_layer.texts.append(TextItem(text, self.points[2], QFont(self.current_font), QColor(self.current_font_color)))
-                    self.update_image()
+                    new_line = LineItem(self.points[0], self.points[1], self.points[2], QColor(self.line_color), line_type=="─ ─ ─",
+                                        width=1 / self.fit_scale)
+                    new_text = TextItem(text, self.points[2], self.document_font(), QColor(self.current_font_color))
+                    self.execute(AddItemsCommand(self, self.current_layer, [new_line, new_text]))
+                self.invalidate_overlay(self.temp_line_bounds())
                 self.drawing = False
                 self.points = []
                 self.temp_line = None
@@ -491,57 +1583,70 @@ class ImageEditor(QMainWindow):
             text, ok = QInputDialog.getText(self, "텍스트 입력", "텍스트:")
             self.unselect()
             if ok and text:
-                self.current_layer.texts.append(TextItem(text, event.pos(), self.current_font, self.current_font_color))
-                self.update_image()
+                new_text = TextItem(text, pos, self.document_font(), QColor(self.current_font_color))
+                self.execute(AddItemsCommand(self, self.current_layer, [new_text]))
+            self.update_image()
             self.adding_text = False
             # self.add_text_btn.setText('텍스트 추가')
         else:
             # 선 선택 로직
-            for layer in self.layers:
-                for line in layer.lines:
-                    if self.is_near_line(event.pos(), line):
-                        self.unselect()  # 기존 선택 해제
-                        self.selected_line = line
-                        self.selected_line.is_selected = True
-                        self.moving_vertex = self.get_nearest_vertex(event.pos(), line)
-                        self.update_image()
-                        return
+            layer, line = self.find_line_at(pos)
+            if line:
+                self.unselect()  # 기존 선택 해제
+                self.selected_line = line
+                self.selected_line.is_selected = True
+                self.moving_vertex = self.get_nearest_vertex(pos, line, layer)
+                self.drag_layer = layer
+                self.invalidate_overlay(line.bounds())
+                self.update_image()
+                return
             
             # 텍스트 선택 로직
-            for layer in self.layers:
-                for text_item in layer.texts:
-                    if text_item.rect and text_item.rect.contains(event.pos()):
-                        if not (event.modifiers() & Qt.ControlModifier):
-                            self.unselect()  # Ctrl 키가 눌리지 않았다면 기존 선택 해제
-                        self.selected_text = text_item
-                        self.add_selected_text(text_item)
-                        self.moving_text = True
-                        self.offset = event.pos() - text_item.position
-                        self.update_image()
-                        return            
+            layer, text_item = self.find_text_at(pos)
+            if text_item:
+                if not (event.modifiers() & Qt.ControlModifier):
+                    self.unselect()  # Ctrl 키가 눌리지 않았다면 기존 선택 해제
+                self.selected_text = text_item
+                self.drag_layer = layer
+                self.add_selected_text(text_item)
+                self.moving_text = True
+                self.offset = pos - text_item.position
+                return            
             self.unselect()
+            self.update_image()
 
     def mouseMoveEvent(self, event: QMouseEvent):
+        # 바뀌기 전/후의 영역만 손상 영역으로 기록
+        if self.pan_start is not None:
+            delta = event.pos() - self.pan_start
+            self.pan_start = event.pos()
+            self.pan_by(delta.x(), delta.y())
+            return
+        pos = self.to_document(event.pos())
         if self.drawing:
+            self.invalidate_overlay(self.temp_line_bounds())
             if len(self.points) == 1:
-                self.temp_line = (self.points[0], event.pos())
+                self.temp_line = (self.points[0], pos)
             elif len(self.points) == 2:
-                self.temp_line = (self.points[0], event.pos(), self.points[1])
+                self.temp_line = (self.points[0], pos, self.points[1])
+            self.invalidate_overlay(self.temp_line_bounds())
         elif self.moving_text and self.selected_text:
-            new_pos = event.pos() - self.offset
-            self.selected_text.position = new_pos
+            # 끌기 한 번이 실행 취소 한 번이 되도록 같은 gesture의 명령은 합쳐짐
+            new_pos = pos - self.offset
+            self.change_items([(self.drag_layer, self.selected_text, 'position', point_tuple(new_pos))], self.gesture)
         elif self.selected_line and self.moving_vertex:
-            new_pos = event.pos()
-            if self.moving_vertex == 'start':
-                self.selected_line.start = new_pos
-            elif self.moving_vertex == 'mid':
-                self.selected_line.mid = new_pos
-            elif self.moving_vertex == 'end':
-                self.selected_line.end = new_pos
+            self.change_items([(self.drag_layer, self.selected_line, self.moving_vertex, point_tuple(pos))], self.gesture)
+        else:
+            # 드래그나 선 그리기 중이 아니면 캔버스는 건드리지 않고 커서만 바꿈
+            self.update_cursor(pos)
+            return
         self.update_image()        
-        self.update_cursor(event.pos())
+        self.update_cursor(pos)
 
     def mouseReleaseEvent(self, event: QMouseEvent):
+        if event.button() == Qt.MiddleButton:
+            self.pan_start = None
+            return
         if self.moving_text:
             self.moving_text = False
         if self.selected_line:
@@ -549,142 +1654,256 @@ class ImageEditor(QMainWindow):
         self.update_image()
     
     def mouseDoubleClickEvent(self, event: QMouseEvent):
+        layer, text_item = self.find_text_at(self.to_document(event.pos()))
+        if text_item:
+            new_text, ok = QInputDialog.getText(self, "텍스트 수정", "새 텍스트:", text=text_item.text)
+            if ok:
+                self.change_items([(layer, text_item, 'text', new_text)])
+                self.update_image()
+
+    def find_line_at(self, point):
+        # 격자로 후보를 좁힌 뒤 후보들의 거리를 한 번에 계산함 (기준 거리는 화면 픽셀)
+        threshold = self.PICK_THRESHOLD / self.view_scale
+        for layer in self.layers:
+            candidates = layer.lines_near(point, threshold)
+            if not candidates:
+                continue
+            line, _ = layer.segments.nearest_segment(point.x(), point.y(), threshold, candidates)
+            if line:
+                return layer, line
+        return None, None
+
+    def find_text_at(self, point):
         for layer in self.layers:
-            for text_item in layer.texts:
-                if text_item.rect and text_item.rect.contains(event.pos()):
-                    new_text, ok = QInputDialog.getText(self, "텍스트 수정", "새 텍스트:", text=text_item.text)
-                    if ok:
-                        text_item.text = new_text
-                    return
+            for text_item in layer.texts_at(point):
+                return layer, text_item
+        return None, None
 
     def unselect(self):
+        for text_item in self.selected_texts:
+            text_item.is_selected = False
+            self.invalidate_overlay(text_item.bounds())
         self.selected_texts.clear()
         if self.selected_line:
+            self.invalidate_overlay(self.selected_line.bounds())
             self.selected_line.is_selected = False
             self.selected_line = None
     
     def add_selected_text(self, text):
         self.selected_texts.add(text)
+        text.is_selected = True
+        self.invalidate_overlay(text.bounds())
         self.update_image()
 
-    def is_near_line(self, point, line, threshold=5):
-        return (self.point_to_line_distance(point, line.start, line.mid) < threshold or
-                self.point_to_line_distance(point, line.mid, line.end) < threshold)
-
-    def point_to_line_distance(self, point, line_start, line_end):
-        p = QPointF(point)
-        a = QPointF(line_start)
-        b = QPointF(line_end)
-        ap = p - a
-        ab = b - a
-        proj = QPointF.dotProduct(ap, ab) / QPointF.dotProduct(ab, ab)
-        proj = max(0, min(1, proj))
-        closest = a + proj * ab
-        return (p - closest).manhattanLength()
-
-    def get_nearest_vertex(self, point, line):
-        distances = [
-            (point - line.start).manhattanLength(),
-            (point - line.mid).manhattanLength(),
-            (point - line.end).manhattanLength()
-        ]
-        min_distance = min(distances)
-        if min_distance == distances[0]:
-            return 'start'
-        elif min_distance == distances[1]:
-            return 'mid'
-        else:
-            return 'end'
+    def layer_of(self, item):
+        for layer in self.layers:
+            if item in layer.lines or item in layer.texts:
+                return layer
+        return None
+
+    def get_nearest_vertex(self, point, line, layer):
+        _, vertex, _ = layer.segments.nearest_vertex(point.x(), point.y(), [line])
+        return vertex
 
     def change_line_color(self):
         color = QColorDialog.getColor(initial=self.line_color)
         if color.isValid():
             self.line_color = color
             self.line_color_menubtn.setStyleSheet(f"color: {color.name()};")
-        for layer in self.layers:
-            for line in layer.lines:
-                if line.is_selected:
-                    line.color = color
+        rgba = QColor(color).rgba()
+        self.change_items([(layer, line, 'color', rgba) for layer in self.layers for line in layer.lines if line.is_selected])
+        self.update_image()
     
     def change_line_type(self):
         is_dashed = self.line_type_combo.currentText() == "─ ─ ─"
         if self.selected_line:
-            self.selected_line.is_dashed = is_dashed
+            self.change_items([(self.layer_of(self.selected_line), self.selected_line, 'dashed', is_dashed)])
+            self.update_image()
+
+    def invalidate(self, rect=None, layer=None):
+        # rect(문서 좌표)가 None이면 캔버스 전체를 다시 그림, layer를 주면 그 레이어 캐시도 같은 영역을 버림
+        if rect is not None:
+            rect = self.damage_rect(rect)
+        if layer is not None:
+            layer.invalidate(rect)
+            if layer is not self.current_layer:
+                self.split_damage += self.canvas_rect if rect is None else rect
+        if rect is None:
+            self.damage = QRegion(self.canvas_rect)
+        elif not rect.isEmpty():
+            self.damage += rect.intersected(self.canvas_rect)
+
+    def invalidate_overlay(self, rect):
+        # 문서는 그대로 두고 오버레이(미리보기, 선택 표시)만 다시 그림
+        rect = self.damage_rect(rect)
+        if not rect.isEmpty():
+            self.overlay_damage += rect.intersected(self.canvas_rect)
+
+    def invalidate_split(self):
+        # 레이어 순서나 현재 레이어가 바뀌면 아래/위 합성 버퍼를 다시 만듦
+        self.split_damage = QRegion(self.canvas_rect)
+        self.invalidate()
+
+    def update_split_buffers(self):
+        if self.split_layer is not self.current_layer:
+            self.split_layer = self.current_layer
+            self.split_damage = QRegion(self.canvas_rect)
+        if self.split_damage.isEmpty():
+            return
+        damage = self.split_damage
+        self.split_damage = QRegion()
+        if self.current_layer in self.layers:
+            index = self.layers.index(self.current_layer)
+        else:
+            index = len(self.layers)
+        self.below_buffer = self.composite_layers(self.below_buffer, self.layers[index + 1:], damage)
+        self.above_buffer = self.composite_layers(self.above_buffer, self.layers[:index], damage)
+
+    def update_device_ratio(self):
+        # 백 버퍼를 화면의 장치 픽셀 크기로 만들어 HiDPI에서 늘려 그리지 않게 함
+        ratio = self.canvas_widget.devicePixelRatioF()
+        if ratio == self.device_ratio:
+            return
+        self.device_ratio = ratio
+        self.canvas = make_buffer(self.canvas_rect.size(), ratio)
+        self.document_buffer = make_buffer(self.canvas_rect.size(), ratio)
+        self.below_buffer = self.above_buffer = None
+        for layer in self.layers:
+            layer.invalidate()
+        self.invalidate_split()
+        self.update_image()
 
-    def initialize_pixmap(self):
-        result = QPixmap(*self.IMAGE_SIZE)
-        result.fill(Qt.transparent)
-        self.image_label.setPixmap(result)
+    def layer_image(self, layer):
+        return layer.rendered(self.canvas_rect.size(), self.view_scale, self.view_offset, self.device_ratio)
+
+    def composite_layers(self, buffer, layers, damage):
+        if buffer is None or buffer.size() != self.canvas.size():
+            buffer = make_buffer(self.canvas_rect.size(), self.device_ratio)
+            damage = QRegion(self.canvas_rect)
+        clip = damage.boundingRect()
+        painter = QPainter(buffer)
+        painter.setClipRegion(damage)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.fillRect(clip, Qt.transparent)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        for layer in layers[::-1]:
+            blit(painter, clip, self.layer_image(layer))
+        painter.end()
+        return buffer
+
+    def temp_line_bounds(self):
+        if not self.temp_line:
+            return QRect()
+        rect = QRect(self.temp_line[0], self.temp_line[0])
+        for point in self.temp_line[1:]:
+            rect = rect.united(QRect(point, point))
+        return rect.normalized()
+
+    def update_document(self, damage):
+        clip = damage.boundingRect()
+        painter = QPainter(self.document_buffer)
+        painter.setClipRegion(damage)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.fillRect(clip, Qt.transparent)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+
+        # 아래 버퍼, 현재 레이어 캐시, 위 버퍼 세 장만 복사함
+        self.update_split_buffers()
+        blit(painter, clip, self.below_buffer)
+        if self.current_layer in self.layers:
+            blit(painter, clip, self.layer_image(self.current_layer))
+        blit(painter, clip, self.above_buffer)
+        painter.end()
 
-    def update_image(self):
-        if not self.layers:
-            self.initialize_pixmap()
-            return
-        
-        result = QPixmap(*self.IMAGE_SIZE)
-        result.fill(Qt.transparent)
-        painter = QPainter(result)
-        
-        for layer in self.layers[::-1]:
-            painter.setOpacity(0.8)
-            painter.drawPixmap(0, 0, layer.pixmap)            
-            
-            for line in layer.lines:
-                pen = QPen(line.color)
-                if line.is_dashed:
-                    pen.setStyle(Qt.DashLine)
-                if line.is_selected:
-                    pen.setWidth(3)
-                painter.setPen(pen)
-                painter.drawLine(line.start, line.mid)
-                painter.drawLine(line.mid, line.end)
-                
-                if line.is_selected:
-                    painter.setBrush(Qt.red)
-                    painter.drawEllipse(line.start, 5, 5)
-                    painter.drawEllipse(line.mid, 5, 5)
-                    painter.drawEllipse(line.end, 5, 5)
-            
-            for text_item in layer.texts:
-                painter.setFont(text_item.current_font)
-                painter.setPen(text_item.color)
-                text_rect = painter.boundingRect(QRectF(text_item.position, QSizeF()), Qt.AlignLeft, text_item.text)
-                painter.drawText(text_rect, text_item.text)
-                text_item.rect = text_rect
-                
-                if text_item in self.selected_texts:
-                    painter.setPen(QPen(Qt.red, 1, Qt.DashLine))
-                    painter.drawRect(text_rect)
-        
+    def paint_overlay(self, painter, clip):
+        # 오버레이는 화면 좌표로 그려서 배율과 상관없이 같은 두께로 보이게 함
+        to_display = self.to_display
         if self.temp_line:
             painter.setPen(QPen(self.line_color))
-            if len(self.temp_line) == 2:
-                painter.drawLine(self.temp_line[0], self.temp_line[1])
-            elif len(self.temp_line) == 3:
-                painter.drawLine(self.temp_line[0], self.temp_line[1])
-                painter.drawLine(self.temp_line[1], self.temp_line[2])
-        
+            points = [to_display(point) for point in self.temp_line]
+            if len(points) == 2:
+                painter.drawLine(points[0], points[1])
+            elif len(points) == 3:
+                painter.drawLine(points[0], points[1])
+                painter.drawLine(points[1], points[2])
+
+        for text_item in self.selected_texts:
+            if not self.damage_rect(text_item.bounds()).intersects(clip):
+                continue
+            painter.setPen(QPen(Qt.red, 1, Qt.DashLine))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawRect(self.display_rect(text_item.rect))
+
+        line = self.selected_line
+        if line and self.damage_rect(line.bounds()).intersects(clip):
+            start, mid, end = to_display(line.start), to_display(line.mid), to_display(line.end)
+            pen = QPen(line.color, 3)
+            if line.is_dashed:
+                pen.setStyle(Qt.DashLine)
+            painter.setPen(pen)
+            painter.drawLine(start, mid)
+            painter.drawLine(mid, end)
+            painter.setBrush(Qt.red)
+            painter.drawEllipse(start, 5, 5)
+            painter.drawEllipse(mid, 5, 5)
+            painter.drawEllipse(end, 5, 5)
+
+    def update_image(self):
+        # 바로 그리지 않고 다음 프레임에 한 번만 그리도록 예약함
+        self.repaint_stats['requested'] += 1
+        if self.repaint_timer.isActive():
+            self.repaint_stats['merged'] += 1
+            return
+        frame_interval = 1.0 / self.max_fps
+        wait = self.last_frame_time + frame_interval - time.perf_counter()
+        self.repaint_timer.start(max(0, int(wait * 1000)))
+
+    def render_frame(self):
+        self.repaint_timer.stop()
+        if self.damage.isEmpty() and self.overlay_damage.isEmpty():
+            self.repaint_stats['dropped'] += 1
+            return
+        self.last_frame_time = time.perf_counter()
+        self.repaint_stats['rendered'] += 1
+        if not self.damage.isEmpty():
+            self.update_document(self.damage)
+        damage = self.damage + self.overlay_damage
+        self.damage = QRegion()
+        self.overlay_damage = QRegion()
+        clip = damage.boundingRect()
+
+        # 캐시된 문서 이미지를 복사한 뒤 그 위에 오버레이만 그림
+        painter = QPainter(self.canvas)
+        painter.setClipRegion(damage)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        blit(painter, clip, self.document_buffer)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        self.paint_overlay(painter, clip)
         painter.end()
-        self.image_label.setPixmap(result)
+        self.canvas_widget.update(damage)  # 위젯은 바뀐 영역만 다시 그림
 
     def update_cursor(self, pos):
         if self.selected_line:
             if self.is_near_vertex(pos, self.selected_line.start) or \
                self.is_near_vertex(pos, self.selected_line.mid) or \
                self.is_near_vertex(pos, self.selected_line.end):
-                self.setCursor(Qt.CrossCursor)
+                self.set_cursor_shape(Qt.CrossCursor)
                 return
         
-        for layer in self.layers:
-            for text_item in layer.texts:
-                if text_item.rect and text_item.rect.contains(pos):
-                    self.setCursor(Qt.SizeAllCursor)
-                    return
+        if self.find_text_at(pos)[1]:
+            self.set_cursor_shape(Qt.SizeAllCursor)
+            return
         
-        self.setCursor(Qt.ArrowCursor)
+        self.set_cursor_shape(Qt.ArrowCursor)
+
+    def set_cursor_shape(self, shape):
+        if shape != self.cursor_shape:
+            self.cursor_shape = shape
+            self.setCursor(shape)
 
     def is_near_vertex(self, point, vertex, threshold=5):
-        return (point - vertex).manhattanLength() < threshold
+        # threshold는 화면 픽셀 기준
+        return (point - vertex).manhattanLength() < threshold / self.view_scale
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,248 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QStandardPaths, QSize, QTimer, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QListView
+from image_loader import read_image
+
+THUMBNAIL_SIZE = 128  # 긴 변 픽셀
+CACHE_BYTES = 256 * 1024 * 1024  # 썸네일 폴더의 최대 크기
+PRUNE_INTERVAL = 64  # 이만큼 새로 쓸 때마다 폴더 크기를 확인함
+# 작업 스레드 풀 우선순위 (큰 것부터 시작)
+VISIBLE_PRIORITY = 2
+PREFETCH_PRIORITY = 1
+
+def default_cache_dir():
+    directory = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation)
+    return os.path.join(directory, 'image_editor', 'thumbnails')
+
+class ThumbnailStore:
+    # 썸네일 PNG를 (경로, 수정 시각, 파일 크기, 썸네일 크기)로 찾는 디스크 캐시, 오래 안 쓴 것부터 지움
+    def __init__(self, cache_dir=None, size=THUMBNAIL_SIZE, max_bytes=CACHE_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.size = size
+        self.max_bytes = max_bytes
+        self.writes = 0
+        self.lock = threading.Lock()  # 여러 작업 스레드가 같이 씀
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def cache_path(self, path):
+        stat = os.stat(path)
+        key = f'{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.size}'
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.png')
+
+    def load(self, path):
+        # 캐시에 있으면 읽고, 없으면 원본을 썸네일 크기로 디코딩해서 저장함 (읽을 수 없으면 null QImage)
+        try:
+            cache_path = self.cache_path(path)
+        except OSError:
+            return QImage()
+        if os.path.exists(cache_path):
+            image = QImage(cache_path)
+            if not image.isNull():
+                try:
+                    os.utime(cache_path)  # 최근에 쓴 파일로 표시
+                except OSError:
+                    pass
+                return image
+        image = read_image(path, (self.size, self.size))
+        if not image.isNull():
+            self.store(cache_path, image)
+        return image
+
+    def store(self, cache_path, image):
+        temp_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.part'
+        if not image.save(temp_path, 'PNG'):
+            return
+        try:
+            os.replace(temp_path, cache_path)
+        except OSError:
+            return
+        with self.lock:
+            self.writes += 1
+            if self.writes % PRUNE_INTERVAL == 0:
+                self.prune()
+
+    def prune(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.png'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+class ThumbnailSignals(QObject):
+    finished = pyqtSignal(str, QImage)
+
+class ThumbnailTask(QRunnable):
+    def __init__(self, path, store, signals, priority=0):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.path = path
+        self.store = store
+        self.signals = signals
+        self.priority = priority
+
+    def run(self):
+        self.signals.finished.emit(self.path, self.store.load(self.path))
+
+class ThumbnailLoader(QObject):
+    # 썸네일을 작업 스레드에서 만들고, 만든 것은 GUI 스레드에서 QPixmap으로 바꿔 메모리에도 LRU로 둠
+    ready = pyqtSignal(str)
+
+    def __init__(self, parent=None, cache_dir=None, size=THUMBNAIL_SIZE, max_pixmaps=512):
+        super().__init__(parent)
+        self.store = ThumbnailStore(cache_dir, size)
+        self.pool = QThreadPool(self)
+        self.signals = ThumbnailSignals()
+        self.signals.finished.connect(self.on_finished)
+        self.pixmaps = OrderedDict()  # 경로 -> QPixmap
+        self.max_pixmaps = max_pixmaps
+        self.tasks = {}  # 경로 -> 만드는 중인 ThumbnailTask
+        self.failed = set()
+
+    def pixmap(self, path):
+        # 메모리에 있으면 바로 돌려주고, 없으면 만들기를 걸고 None (다 되면 ready(path))
+        pixmap = self.pixmaps.get(path)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(path)
+            return pixmap
+        self.request(path)
+        return None
+
+    def request(self, path, priority=0):
+        if path in self.failed or path in self.pixmaps:
+            return
+        task = self.tasks.get(path)
+        if task is not None:
+            # 아직 시작하지 않았으면 더 높은 우선순위로 다시 넣음
+            if priority <= task.priority or not self.pool.tryTake(task):
+                return
+        task = ThumbnailTask(path, self.store, self.signals, priority)
+        self.tasks[path] = task
+        self.pool.start(task, priority)
+
+    def retain(self, paths):
+        # paths에 없는, 아직 시작하지 않은 요청은 취소함 (이미 디코딩 중인 것은 끝까지 둠)
+        for path, task in list(self.tasks.items()):
+            if path not in paths and self.pool.tryTake(task):
+                del self.tasks[path]
+
+    def on_finished(self, path, image):
+        self.tasks.pop(path, None)
+        if image.isNull():
+            self.failed.add(path)
+            return
+        self.pixmaps[path] = QPixmap.fromImage(image)
+        if len(self.pixmaps) > self.max_pixmaps:
+            self.pixmaps.popitem(last=False)
+        self.ready.emit(path)
+
+class ThumbnailGridView(QListView):
+    # 썸네일 격자 보기: 화면에 보이는 칸과 스크롤 방향으로 한 화면만큼만 썸네일을 요청하고, 벗어난 요청은 취소함
+    folder_activated = pyqtSignal(object)  # 프록시 모델 인덱스
+    PREFETCH_PAGES = 1
+
+    def __init__(self, thumbnail_loader, parent=None):
+        super().__init__(parent)
+        self.thumbnail_loader = thumbnail_loader
+        size = thumbnail_loader.store.size
+        self.setViewMode(QListView.IconMode)
+        self.setIconSize(QSize(size, size))
+        self.setGridSize(QSize(size + 24, size + 40))
+        self.setResizeMode(QListView.Adjust)
+        self.setMovement(QListView.Static)
+        self.setUniformItemSizes(True)  # 칸 크기를 항목마다 재지 않음
+        self.setWordWrap(True)
+        self.last_scroll = 0
+        self.scroll_down = True
+        # 스크롤/크기 변경/폴더 읽기가 한꺼번에 와도 요청 계산은 한 번만
+        self.request_timer = QTimer(self)
+        self.request_timer.setSingleShot(True)
+        self.request_timer.timeout.connect(self.update_requests)
+        self.verticalScrollBar().valueChanged.connect(self.on_scroll)
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.rowsInserted.connect(self.schedule_requests)
+        model.layoutChanged.connect(self.schedule_requests)
+        model.modelReset.connect(self.schedule_requests)
+
+    def setRootIndex(self, index):
+        super().setRootIndex(index)
+        self.schedule_requests()
+
+    def schedule_requests(self, *args):
+        if not self.request_timer.isActive():
+            self.request_timer.start(0)
+
+    def on_scroll(self, value):
+        self.scroll_down = value >= self.last_scroll
+        self.last_scroll = value
+        self.schedule_requests()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.schedule_requests()
+
+    def keyPressEvent(self, event):
+        # Backspace: 상위 폴더로
+        if event.key() == Qt.Key_Backspace and self.rootIndex().isValid():
+            self.folder_activated.emit(self.rootIndex().parent())
+            return
+        super().keyPressEvent(event)
+
+    def visible_rows(self):
+        # 고른 칸 크기로 왼쪽에서 오른쪽으로 채우므로 스크롤 위치에서 보이는 줄 범위를 바로 계산함
+        model = self.model()
+        root = self.rootIndex()
+        count = model.rowCount(root) if model is not None else 0
+        if not count:
+            return 0, 0, 0
+        grid = self.gridSize()
+        columns = max(1, self.viewport().width() // grid.width())
+        top = max(0, -self.visualRect(model.index(0, 0, root)).top() // grid.height())
+        rows = self.viewport().height() // grid.height() + 2
+        return columns, min(count, top * columns), min(count, (top + rows) * columns)
+
+    def update_requests(self):
+        if not self.isVisible():
+            return
+        columns, first, last = self.visible_rows()
+        page = last - first
+        if self.scroll_down:
+            prefetch = range(last, last + page * self.PREFETCH_PAGES)
+        else:
+            prefetch = range(max(0, first - page * self.PREFETCH_PAGES), first)
+        model = self.model()
+        root = self.rootIndex()
+        count = model.rowCount(root) if model is not None else 0
+        wanted = set()
+        for rows, priority in ((range(first, last), VISIBLE_PRIORITY), (prefetch, PREFETCH_PRIORITY)):
+            for row in rows:
+                if row >= count:
+                    break
+                path = self.file_path(model.index(row, 0, root))
+                if path:
+                    wanted.add(path)
+                    self.thumbnail_loader.request(path, priority)
+        self.thumbnail_loader.retain(wanted)
+
+    def file_path(self, index):
+        # 폴더는 썸네일을 만들지 않음
+        model = self.model()
+        source = model.mapToSource(index)
+        file_model = model.sourceModel()
+        if file_model.isDir(source):
+            return None
+        return file_model.filePath(source)
\ No newline at end of file
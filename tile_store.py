@@ -0,0 +1,199 @@
+import os
+import hashlib
+import threading
+import tempfile
+from collections import OrderedDict
+import numpy as np
+from PyQt5.QtCore import Qt, QRect, QSize
+from PyQt5.QtGui import QImage, QImageReader, QImageIOHandler
+from image_loader import read_image
+
+TILE_SIZE = 256
+BAND_PIXELS = 64 * 1024 * 1024  # 이보다 큰 이미지는 띠 단위로 나눠 디코딩 (한 번에 RAM에 올리는 최대 픽셀 수)
+CACHE_BYTES = 8 * 1024 * 1024 * 1024  # 타일 파일 폴더의 최대 크기
+
+def image_array(image):
+    # QImage 픽셀을 복사 없이 (높이, 너비, 4) 배열로 봄 (image가 살아 있는 동안만 유효)
+    ptr = image.bits()
+    ptr.setsize(image.byteCount())
+    rows = np.frombuffer(ptr, dtype=np.uint8).reshape(image.height(), image.bytesPerLine())
+    return rows[:, :image.width() * 4].reshape(image.height(), image.width(), 4)
+
+class TiledImage:
+    # 큰 이미지를 TILE_SIZE 정사각 타일로 나눠 메모리 맵 파일에 두고, 필요한 타일만 QImage로 꺼내 LRU로 캐시
+    FORMAT = QImage.Format_ARGB32_Premultiplied
+
+    def __init__(self, path, size, tile_size=TILE_SIZE, max_tiles=256):
+        self.path = path
+        self.size = QSize(size)
+        self.tile_size = tile_size
+        self.columns = -(-size.width() // tile_size)
+        self.rows = -(-size.height() // tile_size)
+        # 타일 하나가 파일에서 연속된 구간이 되도록 (행, 열, 타일 높이, 타일 너비, 4) 순서로 저장
+        self.data = np.memmap(path, dtype=np.uint8, mode='r', shape=self.shape(size, tile_size))
+        self.tiles = OrderedDict()  # (tx, ty) -> QImage
+        self.max_tiles = max_tiles
+        self.lock = threading.Lock()  # 내보내기 때 여러 스레드가 같이 타일을 꺼냄
+
+    @staticmethod
+    def shape(size, tile_size=TILE_SIZE):
+        return (-(-size.height() // tile_size), -(-size.width() // tile_size), tile_size, tile_size, 4)
+
+    @classmethod
+    def cache_path(cls, source_path, size, cache_dir, tile_size=TILE_SIZE):
+        stat = os.stat(source_path)
+        key = f'{os.path.abspath(source_path)}|{stat.st_mtime_ns}|{stat.st_size}|{size.width()}x{size.height()}|{tile_size}'
+        return os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.tiles')
+
+    @classmethod
+    def from_file(cls, source_path, target_size=None, cache_dir=None, tile_size=TILE_SIZE):
+        # target_size 안에 맞춘 크기로 타일 파일을 만들고 연다 (같은 파일/크기면 디스크에 남은 것을 재사용)
+        # 읽을 수 없는 파일이면 None
+        size = QImageReader(source_path).size()
+        if not size.isValid():
+            return None
+        if target_size is not None:
+            size = size.scaled(QSize(*target_size), Qt.KeepAspectRatio)
+        return cls.cached(source_path, size, cache_dir, tile_size, lambda: cls.read_bands(source_path, size, tile_size))
+
+    def half(self, source_path, cache_dir=None):
+        # 가로세로 반(올림) 크기로 줄인 타일 이미지, 원본을 다시 디코딩하지 않고 이 이미지의 타일에서 만듦
+        size = QSize(-(-self.size.width() // 2), -(-self.size.height() // 2))
+        return self.cached(source_path, size, cache_dir, self.tile_size, self.half_bands)
+
+    @classmethod
+    def cached(cls, source_path, size, cache_dir, tile_size, bands):
+        # bands: 타일 파일이 디스크에 없을 때만 불러 (위쪽 y, (높이, 너비, 4) 픽셀 배열) 띠들을 받음
+        cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), 'image_editor_tiles')
+        os.makedirs(cache_dir, exist_ok=True)
+        path = cls.cache_path(source_path, size, cache_dir, tile_size)
+        expected = int(np.prod(cls.shape(size, tile_size)))
+        if os.path.exists(path) and os.path.getsize(path) == expected:
+            os.utime(path)  # 최근에 쓴 파일로 표시
+        else:
+            if not cls.write_tiles(bands(), size, path, tile_size):
+                return None
+            cls.prune(cache_dir, keep=path)
+        return cls(path, size, tile_size)
+
+    @staticmethod
+    def prune(cache_dir, max_bytes=CACHE_BYTES, keep=None):
+        # 오래 안 쓴 타일 파일부터 지워 폴더 크기를 제한함
+        entries = []
+        for name in os.listdir(cache_dir):
+            if name.endswith('.tiles'):
+                path = os.path.join(cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)  # 다른 창에서 열려 있으면 (Windows) 지우지 못할 수 있음
+            except OSError:
+                continue
+            total -= size
+
+    @classmethod
+    def write_tiles(cls, bands, size, path, tile_size=TILE_SIZE):
+        # 띠의 위쪽 y는 타일 크기의 배수
+        # 같은 파일을 여러 스레드가 동시에 만들어도 서로 덮어쓰지 않도록 임시 파일 이름을 나눔
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.part'
+        data = np.memmap(temp_path, dtype=np.uint8, mode='w+', shape=cls.shape(size, tile_size))
+        try:
+            for top, pixels in bands:
+                for row in range(-(-pixels.shape[0] // tile_size)):
+                    y = row * tile_size
+                    strip = pixels[y:y + tile_size]
+                    for column in range(data.shape[1]):
+                        x = column * tile_size
+                        block = strip[:, x:x + tile_size]
+                        data[top // tile_size + row, column, :block.shape[0], :block.shape[1]] = block
+            data.flush()
+        except ValueError:
+            del data
+            os.remove(temp_path)
+            return False
+        del data
+        os.replace(temp_path, path)
+        return True
+
+    @classmethod
+    def read_bands(cls, source_path, size, tile_size=TILE_SIZE):
+        # 원본 크기 그대로이고 형식이 부분 디코딩을 지원하면 타일 줄 단위 띠로 나눠 읽어 메모리를 제한함
+        reader = QImageReader(source_path)
+        width, height = size.width(), size.height()
+        band_rows = max(1, BAND_PIXELS // (width * tile_size)) * tile_size
+        if reader.size() != size or height <= band_rows or not reader.supportsOption(QImageIOHandler.ClipRect):
+            image = read_image(source_path, None if reader.size() == size else (width, height))
+            if image.isNull():
+                raise ValueError(source_path)
+            image = image.convertToFormat(cls.FORMAT)  # 배열을 쓰는 동안 살아 있게 붙잡아 둠
+            yield 0, image_array(image)
+            return
+        for top in range(0, height, band_rows):
+            reader = QImageReader(source_path)
+            reader.setClipRect(QRect(0, top, width, min(band_rows, height - top)))
+            band = reader.read()
+            if band.isNull():
+                raise ValueError(source_path)
+            band = band.convertToFormat(cls.FORMAT)
+            yield top, image_array(band)
+
+    def half_bands(self):
+        # 타일 두 줄씩 읽어 2x2 평균으로 줄인 띠를 냄 (premultiplied라 채널별 평균이 그대로 맞음)
+        tile = self.tile_size
+        width, height = self.size.width(), self.size.height()
+        for ty in range(0, self.rows, 2):
+            rows = self.data[ty:ty + 2]  # (타일 줄, 열, 타일 높이, 타일 너비, 4)
+            strip = rows.transpose(0, 2, 1, 3, 4).reshape(rows.shape[0] * tile, self.columns * tile, 4)
+            strip = strip[:min(2 * tile, height - ty * tile), :width].astype(np.uint16)
+            if strip.shape[0] % 2 or strip.shape[1] % 2:
+                # 홀수 크기의 마지막 줄/열은 복제해서 평균함 (타일 여백의 투명 픽셀이 섞이지 않게)
+                strip = np.pad(strip, ((0, strip.shape[0] % 2), (0, strip.shape[1] % 2), (0, 0)), mode='edge')
+            half = (strip[0::2, 0::2] + strip[1::2, 0::2] + strip[0::2, 1::2] + strip[1::2, 1::2] + 2) >> 2
+            yield ty * tile // 2, half.astype(np.uint8)
+
+    def tile_rect(self, tx, ty):
+        size = self.tile_size
+        return QRect(tx * size, ty * size, size, size)
+
+    def tiles_in(self, rect):
+        # rect와 겹치는 타일 번호
+        rect = rect.intersected(QRect(0, 0, self.size.width(), self.size.height()))
+        if rect.isEmpty():
+            return
+        size = self.tile_size
+        for ty in range(rect.top() // size, rect.bottom() // size + 1):
+            for tx in range(rect.left() // size, rect.right() // size + 1):
+                yield tx, ty
+
+    def tile(self, tx, ty):
+        key = (tx, ty)
+        with self.lock:
+            image = self.tiles.get(key)
+            if image is not None:
+                self.tiles.move_to_end(key)
+                return image
+        size = self.tile_size
+        image = QImage(size, size, self.FORMAT)
+        image_array(image)[:] = self.data[ty, tx]  # 메모리 맵에서 한 번만 복사
+        with self.lock:
+            self.tiles[key] = image
+            if len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+        return image
+
+    def draw(self, painter, clip):
+        # clip(이미지 좌표)과 겹치는 타일만 꺼내 그림 (가장자리 타일의 빈 여백은 그리지 않음)
+        clip = clip.intersected(QRect(0, 0, self.size.width(), self.size.height()))
+        for tx, ty in self.tiles_in(clip):
+            rect = self.tile_rect(tx, ty)
+            source = rect.intersected(clip)
+            painter.drawImage(source, self.tile(tx, ty), source.translated(-rect.topLeft()))
+
+    def clear(self):
+        self.tiles.clear()
\ No newline at end of file